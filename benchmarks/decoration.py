@@ -0,0 +1,46 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import inspect
+import sys
+import timeit
+
+
+def _stack_lookup():
+    return inspect.stack()[1].filename
+
+
+def _frame_lookup():
+    return sys._getframe(1).f_code.co_filename
+
+
+def _nested(depth, lookup):
+    if depth:
+        return _nested(depth - 1, lookup)
+    return lookup()
+
+
+def _main():
+    for depth in (5, 25, 100):
+        for name, lookup in (('inspect.stack()', _stack_lookup), ('sys._getframe()', _frame_lookup)):
+            number = 200
+            total = min(timeit.repeat(lambda: _nested(depth, lookup), number=number, repeat=5))
+            print(f'depth={depth:<4} {name:<16} {total / number * 1e6:10.2f} us/decoration')
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,57 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import ast
+import timeit
+
+from eqtex.config import Config
+from eqtex.func_visitor import FuncVisitor
+
+
+class _GetattrFuncVisitor(FuncVisitor):
+    def process(self, node, *args, func_suffix=None, ignore_missing=True):
+        if func_suffix:
+            name = f'process_{func_suffix}'
+        else:
+            name = f'process_{node.__class__.__name__}'
+
+        method = getattr(self, name, None)
+        if method:
+            return method(node, *args)
+        elif ignore_missing:
+            return None
+        else:
+            raise RuntimeError(f'{name}() not found!')
+
+
+def _source(statements):
+    lines = ['def func(x, y):']
+    for i in range(statements):
+        lines.append(f'    v{i} = (x + {i}) * y - x / ({i} + 1) ** 2 @ y')
+    return '\n'.join(lines)
+
+
+def _main():
+    for statements in (100, 1000, 5000):
+        func = ast.parse(_source(statements)).body[0]
+        for name, visitor_cls in (('getattr', _GetattrFuncVisitor), ('table', FuncVisitor)):
+            total = min(timeit.repeat(lambda: visitor_cls(Config()).visit(func), number=5, repeat=5))
+            print(f'statements={statements:<6} {name:<8} {total / 5 * 1e3:10.2f} ms/function')
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,205 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import ast
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from eqtex import BundleOutput, __version__, eqtex_config, eqtex_source_cache
+from eqtex.config import Config
+from eqtex.file_output import _FileOutput
+from eqtex.func_visitor import FuncVisitor
+from eqtex.source_visitor import FunctionIndex, SourceVisitor
+
+HEADER = 'from numpy import *\nfrom eqtex import eqtex\n\n'
+
+
+def _many_functions(size):
+    return ''.join(f'@eqtex()\n'
+                   f'def func{i}(x, y):\n'
+                   f'    a = x + {i}\n'
+                   f'    b = a * y - x / 2\n'
+                   f'    c = b ** 2 + a @ y\n'
+                   f'    d = -c + b\n\n' for i in range(50 * size))
+
+
+def _long_body(size):
+    body = ''.join(f'    v{i} = (x + {i}) * y - x / ({i} + 1) ** 2\n' for i in range(200 * size))
+    return f'@eqtex()\ndef func(x, y):\n{body}'
+
+
+def _deep_expression(size):
+    expr = 'x'
+    for i in range(20 * size):
+        expr = f'({expr} + {i}) * y' if i % 2 else f'{expr} - {i} / y'
+    return f'@eqtex()\ndef func(x, y):\n    a = {expr}\n'
+
+
+def _assignment_chain(size):
+    body = ''.join(f'    v{i} = v{i - 1} * x + {i}\n' for i in range(1, 100 * size))
+    return f'@eqtex()\ndef func(x):\n    v0 = x\n{body}'
+
+
+def _numpy_literals(size):
+    rows = ', '.join('[' + ', '.join(str(r * 7 + c) for c in range(10 * size)) + ']' for r in range(10 * size))
+    return f'@eqtex()\ndef func(x):\n    A = array([{rows}])\n    B = eye({10 * size})\n    C = ones([{size}, 50])\n'
+
+
+SCENARIOS = {
+    'many_functions': _many_functions,
+    'long_body': _long_body,
+    'deep_expression': _deep_expression,
+    'assignment_chain': _assignment_chain,
+    'numpy_literals': _numpy_literals,
+}
+
+
+def _best(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def _import(path, source, enabled):
+    eqtex_config.enabled = enabled
+    eqtex_source_cache.clear()
+    exec(compile(source, path, 'exec'), {'__name__': 'eqtex_benchmark'})
+
+
+def _bench_source(source, work_dir, repeat):
+    config = Config()
+    tree = ast.parse(source)
+    index = FunctionIndex()
+    index.visit(tree)
+    nodes = [node for functions in index.functions.values() for _, node in functions]
+
+    def translate():
+        for node in nodes:
+            FuncVisitor(config).visit(node)
+
+    def file_output():
+        SourceVisitor(None, _FileOutput(), config).visit(tree)
+
+    def bundle_output():
+        output = BundleOutput(os.path.join(work_dir, 'bundle.db'), os.path.join(work_dir, 'bundle.tex'))
+        SourceVisitor(None, output, config).visit(tree)
+        output.close()
+
+    path = os.path.join(work_dir, 'module.py')
+    with open(path, 'w') as f:
+        f.write(source)
+
+    results = {
+        'source_bytes': len(source),
+        'parse': _best(lambda: ast.parse(source), repeat),
+        'index': _best(lambda: FunctionIndex().visit(tree), repeat),
+        'translate': _best(translate, repeat),
+        'file_output': _best(file_output, repeat),
+        'bundle_output': _best(bundle_output, repeat),
+    }
+    disabled = _best(lambda: _import(path, source, False), repeat)
+    enabled = _best(lambda: _import(path, source, True), repeat)
+    eqtex_config.reset()
+    results['import_overhead'] = max(0.0, enabled - disabled)
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _run(cmd_args):
+    results = {}
+    work_dir = tempfile.mkdtemp(prefix='eqtex_bench_')
+    cwd = os.getcwd()
+    os.chdir(work_dir)
+    try:
+        for name, generator in SCENARIOS.items():
+            if cmd_args.scenario and name not in cmd_args.scenario:
+                continue
+            for size in cmd_args.sizes:
+                key = f'{name}/{size}'
+                results[key] = _bench_source(HEADER + generator(size), work_dir, cmd_args.repeat)
+                print(f'{key:<24}' + ' '.join(f'{stage}={value * 1e3:.2f}ms' for stage, value in results[key].items()
+                                              if stage != 'source_bytes'))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {
+        'eqtex': __version__,
+        'revision': _git_revision(),
+        'python': platform.python_version(),
+        'results': results,
+    }
+
+
+def _compare(current, baseline_path, threshold):
+    with open(baseline_path, 'r') as f:
+        baseline = json.load(f)
+
+    regressions = 0
+    print(f'\ncompared with {baseline.get("revision")} ({baseline_path})')
+    for key, stages in current['results'].items():
+        old_stages = baseline['results'].get(key, {})
+        for stage, value in stages.items():
+            old = old_stages.get(stage)
+            if stage == 'source_bytes' or not old:
+                continue
+            ratio = value / old
+            flag = ' REGRESSION' if ratio > threshold else ''
+            regressions += bool(flag)
+            print(f'{key:<24} {stage:<16} {old * 1e3:10.2f}ms -> {value * 1e3:10.2f}ms  x{ratio:.2f}{flag}')
+    return regressions
+
+
+def _main():
+    p = argparse.ArgumentParser(description='EqTex translation pipeline benchmarks')
+    p.add_argument('-s', '--sizes', help='Size multipliers', type=int, nargs='+', default=[1, 4, 16])
+    p.add_argument('--scenario', help='Run only given scenarios', choices=sorted(SCENARIOS), nargs='+')
+    p.add_argument('-r', '--repeat', help='Repetitions per measurement (best is kept)', type=int, default=3)
+    p.add_argument('-o', '--output', help='Write results as JSON', type=str)
+    p.add_argument('-c', '--compare', help='Compare with results from a previous run', type=str)
+    p.add_argument('--threshold', help='Slowdown ratio reported as regression', type=float, default=1.25)
+    cmd_args = p.parse_args()
+
+    current = _run(cmd_args)
+    if cmd_args.output:
+        with open(cmd_args.output, 'w') as f:
+            json.dump(current, f, indent=2, sort_keys=True)
+
+    if cmd_args.compare and _compare(current, cmd_args.compare, cmd_args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    _main()
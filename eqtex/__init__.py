@@ -15,11 +15,15 @@
 # You should have received a copy of the GNU Lesser Public License
 # along with EqTex. If not, see <http://www.gnu.org/licenses/>.
 
+from .bundle_output import BundleOutput
 from .config import eqtex_config
 from .main import _main
 from .output import Output
-from .tag import eqtex
+from .tag import eqtex, flush, get_tex
+from .version import __version__
 from .preview import PreviewOutput
+from .source_cache import eqtex_source_cache
+from .stats import eqtex_stats
 
 if __name__ == '__main__':
     _main()
@@ -0,0 +1,133 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import functools
+import os
+import shutil
+import subprocess
+import tempfile
+
+from .config import eqtex_config
+from .image_cache import ImageCache
+from .output import Output
+from .preview import _DVIPNG_OPTIONS, _EQUATION, _PREAMBLE
+from .source_cache import eqtex_source_cache
+from .source_visitor import find_function, index_source, translate_function
+
+
+def _translate(func, source, path, qualname, config):
+    if func is not None:
+        func = getattr(func, '__wrapped__', func)
+        qualname, nodes = find_function(eqtex_source_cache.functions(func.__code__.co_filename), func)
+    else:
+        if source is not None:
+            functions = index_source(source)
+        elif path is not None:
+            functions = eqtex_source_cache.functions(path)
+        else:
+            raise RuntimeError('func, source or path is required')
+        nodes = functions.get(qualname)
+
+    if not nodes:
+        raise RuntimeError(f'Function {qualname} not found')
+
+    return (qualname,) + translate_function(qualname, nodes, config)
+
+
+def _write(path, text):
+    with open(path, 'w') as f:
+        f.write(text)
+
+
+async def _exec(*cmd, cwd=None):
+    process = await asyncio.create_subprocess_exec(*cmd, cwd=cwd, stdin=subprocess.DEVNULL,
+                                                   stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    output, _ = await process.communicate()
+    if process.returncode:
+        raise RuntimeError(f'{cmd[0]} exited abnormally with the following output:\n{output.decode(errors="replace")}')
+
+
+class AsyncRenderer:
+    def __init__(self, max_processes=None, executor=None, cache=None):
+        self.max_processes = max_processes or os.cpu_count() or 1
+        self.executor = executor
+
+        if cache is None:
+            try:
+                cache = ImageCache()
+            except OSError:
+                cache = False
+        self.cache = cache
+
+        self._loop = None
+        self._semaphore = None
+
+    def _run(self, func, *args):
+        return asyncio.get_event_loop().run_in_executor(self.executor, functools.partial(func, *args))
+
+    def _limit(self):
+        # Semaphores belong to the loop they were created in
+        loop = asyncio.get_event_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_processes)
+        return self._semaphore
+
+    async def translate(self, func=None, *, source=None, path=None, qualname=None, **options):
+        global eqtex_config
+        config = eqtex_config.snapshot().replace(**options)
+        _, sym_tex, val_tex = await self._run(_translate, func, source, path, qualname, config)
+        return sym_tex, val_tex
+
+    async def render(self, tex, name):
+        document = _EQUATION.format(tex if isinstance(tex, str) else r'\\'.join(tex))
+        if self.cache:
+            key = self.cache.key(document, _PREAMBLE, _DVIPNG_OPTIONS)
+            if await self._run(self.cache.fetch, key, name):
+                return name
+
+        async with self._limit():
+            work_dir = await self._run(tempfile.mkdtemp)
+            try:
+                tex_path = os.path.join(work_dir, 'eqtex.tex')
+                await self._run(_write, tex_path, f'{_PREAMBLE}{document}\n\\end{{document}}\n')
+                await _exec('latex', '-halt-on-error', '-interaction=nonstopmode', tex_path, cwd=work_dir)
+                await _exec('dvipng', *_DVIPNG_OPTIONS, '-o', os.path.join(work_dir, 'page%d.png'),
+                            os.path.join(work_dir, 'eqtex.dvi'), cwd=work_dir)
+                await self._run(shutil.move, os.path.join(work_dir, 'page1.png'), name)
+            finally:
+                await self._run(shutil.rmtree, work_dir, True)
+
+        if self.cache:
+            await self._run(self.cache.store, key, name)
+            await self._run(self.cache.evict)
+        return name
+
+    async def render_function(self, func=None, *, source=None, path=None, qualname=None, directory='.', **options):
+        global eqtex_config
+        config = eqtex_config.snapshot().replace(**options)
+        qualname, sym_tex, val_tex = await self._run(_translate, func, source, path, qualname, config)
+
+        *prefix, func_name = qualname.split('.')
+        base_name = os.path.join(directory, f'{"_".join(prefix)}_{func_name}')
+        jobs = []
+        if config.sym_equation:
+            jobs.append(self.render(sym_tex, f'{base_name}_{Output.EqType.SYM.value}.png'))
+        if config.val_equation:
+            jobs.append(self.render(val_tex, f'{base_name}_{Output.EqType.NUM.value}.png'))
+        return await asyncio.gather(*jobs)
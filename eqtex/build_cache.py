@@ -0,0 +1,165 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import ast
+import atexit
+import functools
+import hashlib
+import json
+import os
+import threading
+
+from .version import __version__
+
+_IGNORED_OPTIONS = {'enabled', 'lazy', 'stats', 'build_cache', 'capture', 'capture_rate', 'capture_max',
+                    'capture_precision'}
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def _sha1(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def source_hash(file_path):
+    with open(file_path, 'rb') as f:
+        return _sha1(f.read())
+
+
+def function_hash(nodes):
+    return _sha1(''.join(ast.dump(node) for node in nodes).encode())
+
+
+@functools.lru_cache(maxsize=64)
+def config_key(config):
+    options = sorted((k, v) for k, v in config.items() if k not in _IGNORED_OPTIONS)
+    return _sha1(f'{__version__}{options!r}'.encode())
+
+
+def get_build_cache(path, target=''):
+    key = (os.path.abspath(path), target)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = BuildCache(*key)
+    return cache
+
+
+def _save_all():
+    with _caches_lock:
+        caches = list(_caches.values())
+    for cache in caches:
+        if cache.modified:
+            cache.save()
+
+
+class BuildCache:
+    def __init__(self, path, target=''):
+        self.path = path
+        self.target = target
+        self.files = {}
+        self.modified = False
+        self.skipped = 0
+        self._lock = threading.RLock()
+        self.load()
+
+    def read(self):
+        try:
+            with open(self.path, 'r') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+
+        if manifest.get('version') != __version__:
+            manifest = {'version': __version__, 'targets': {}}
+        return manifest
+
+    def load(self):
+        with self._lock:
+            self.files = self.read()['targets'].get(self.target, {})
+
+    def save(self):
+        with self._lock:
+            manifest = self.read()
+            manifest['targets'][self.target] = self.files
+            tmp_path = f'{self.path}.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(manifest, f, sort_keys=True)
+            os.replace(tmp_path, self.path)
+            self.modified = False
+
+    def _functions(self, file_path):
+        return self.files.get(os.path.abspath(file_path), {}).get('functions', {})
+
+    def _is_valid(self, entry, key):
+        # Outputs that report no files (in-memory ones) can not be checked, so they are never fresh
+        outputs = entry['outputs']
+        return entry['config'] == key and bool(outputs) and all(os.path.exists(f) for f in outputs)
+
+    def is_file_fresh(self, file_path, file_hash, config):
+        key = config_key(config)
+        with self._lock:
+            entry = self.files.get(os.path.abspath(file_path))
+            if not entry or entry['hash'] != file_hash:
+                return False
+
+            functions = entry['functions'].values()
+            if all(self._is_valid(f, key) for f in functions):
+                self.skipped += len(functions)
+                return True
+            return False
+
+    def function_hashes(self, file_path, config):
+        key = config_key(config)
+        with self._lock:
+            return {qualname: f['hash'] for qualname, f in self._functions(file_path).items()
+                    if self._is_valid(f, key)}
+
+    def is_fresh(self, file_path, qualname, func_hash, config):
+        key = config_key(config)
+        with self._lock:
+            entry = self._functions(file_path).get(qualname)
+            if entry and entry['hash'] == func_hash and self._is_valid(entry, key):
+                self.skipped += 1
+                return True
+            return False
+
+    def update_function(self, file_path, qualname, func_hash, outputs, config):
+        function = {
+            'config': config_key(config),
+            'hash': func_hash,
+            'outputs': sorted(os.path.abspath(f) for f in outputs),
+        }
+        with self._lock:
+            entry = self.files.setdefault(os.path.abspath(file_path), {'hash': None, 'functions': {}})
+            entry['hash'] = None
+            if outputs:
+                entry['functions'][qualname] = function
+            else:
+                entry['functions'].pop(qualname, None)
+            self.modified = True
+
+    def update_file(self, file_path, file_hash, qualnames):
+        with self._lock:
+            entry = self.files.setdefault(os.path.abspath(file_path), {'hash': None, 'functions': {}})
+            entry['functions'] = {q: f for q, f in entry['functions'].items() if q in qualnames}
+            entry['hash'] = file_hash if all(q in entry['functions'] for q in qualnames) else None
+            self.modified = True
+
+
+atexit.register(_save_all)
@@ -0,0 +1,142 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sqlite3
+
+from .output import Output, register_output, unregister_output
+
+_SCHEMA = 'CREATE TABLE IF NOT EXISTS equations (' \
+          'qualname TEXT NOT NULL, ' \
+          'kind TEXT NOT NULL, ' \
+          'idx INTEGER NOT NULL, ' \
+          'tex TEXT NOT NULL, ' \
+          'PRIMARY KEY (qualname, kind, idx))'
+
+
+class BundleOutput(Output):
+    def __init__(self, path='eqtex.db', tex_path=None, batch_size=1000):
+        self.path = path
+        self.tex_path = tex_path
+        self.batch_size = batch_size
+        self.written = 0
+        self.skipped = 0
+        self.rows = 0
+        self.functions = {}
+        # Callers serialise access through lock(), so the connection may be used by any thread
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute(_SCHEMA)
+        # Closed by the exit hook of eqtex.tag, after lazy functions are flushed into it
+        register_output(self)
+
+    def store(self, qualname, eq_type, tex):
+        if self.connection is None:
+            raise RuntimeError(f'{self.path} is already closed')
+
+        self.functions[(qualname, eq_type.value)] = tex
+        self.rows += len(tex)
+        if self.rows >= self.batch_size:
+            self.flush()
+
+    def process(self, func_name, cls_prefix, eq_type, tex, config):
+        self.store('.'.join(list(cls_prefix) + [func_name]), eq_type, tex)
+        return [self.path]
+
+    def begin_function(self, func_name, cls_prefix, config):
+        self.qualname = '.'.join(list(cls_prefix) + [func_name])
+        self.tex = {}
+        if config.sym_equation:
+            self.tex[Output.EqType.SYM] = []
+        if config.val_equation:
+            self.tex[Output.EqType.NUM] = []
+
+    def equation(self, eq_type, tex):
+        self.tex[eq_type].append(tex)
+
+    def end_function(self):
+        for eq_type, tex in self.tex.items():
+            self.store(self.qualname, eq_type, tex)
+        self.tex = {}
+        return [self.path]
+
+    def abort_function(self):
+        self.tex = {}
+
+    def flush(self):
+        with self.lock():
+            if self.connection is None or not self.functions:
+                return
+
+            rows = [(qualname, kind, i, t) for (qualname, kind), tex in self.functions.items()
+                    for i, t in enumerate(tex)]
+            with self.connection:
+                self.connection.executemany('DELETE FROM equations WHERE qualname = ? AND kind = ?', self.functions)
+                self.connection.executemany('INSERT INTO equations VALUES (?, ?, ?, ?)', rows)
+            self.written += len(rows)
+            self.functions = {}
+            self.rows = 0
+
+    def fetch(self, qualname, eq_type=Output.EqType.SYM, index=None):
+        with self.lock():
+            self.flush()
+            if index is not None:
+                row = self.connection.execute('SELECT tex FROM equations WHERE qualname = ? AND kind = ? AND idx = ?',
+                                              (qualname, eq_type.value, index)).fetchone()
+                return row[0] if row else None
+
+            rows = self.connection.execute('SELECT tex FROM equations WHERE qualname = ? AND kind = ? ORDER BY idx',
+                                           (qualname, eq_type.value)).fetchall()
+            return r'\\'.join(row[0] for row in rows) if rows else None
+
+    def write_tex(self, tex_path):
+        with self.lock():
+            self._write_tex(tex_path)
+
+    def _write_tex(self, tex_path):
+        self.flush()
+        rows = self.connection.execute('SELECT qualname, kind, idx, tex FROM equations ORDER BY qualname, kind, idx')
+        tmp_path = f'{tex_path}.tmp'
+        with open(tmp_path, 'w', buffering=1024 * 1024) as f:
+            f.write(r'\providecommand{\eqtex}[2]{\csname eqtex@#1@#2\endcsname}' '\n')
+            key, tex = None, []
+            for qualname, kind, idx, eq in rows:
+                if key != (qualname, kind):
+                    self._write_macro(f, key, tex)
+                    key, tex = (qualname, kind), []
+                f.write(f'\\expandafter\\def\\csname eqtex@{qualname}@{kind}@{idx}\\endcsname{{{eq}}}\n')
+                tex.append(eq)
+            self._write_macro(f, key, tex)
+        os.replace(tmp_path, tex_path)
+
+    def _write_macro(self, f, key, tex):
+        if key:
+            qualname, kind = key
+            f.write(f'\\expandafter\\def\\csname eqtex@{qualname}@{kind}\\endcsname{{')
+            f.write(r'\\'.join(tex))
+            f.write('}\n')
+
+    def close(self):
+        with self.lock():
+            if self.connection is None:
+                return
+
+            self.flush()
+            if self.tex_path:
+                self.write_tex(self.tex_path)
+            self.connection.close()
+            self.connection = None
+        unregister_output(self)
@@ -0,0 +1,198 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import ast
+import dis
+import functools
+import numbers
+import random
+import sys
+import threading
+
+from .expr import Text
+from .func_visitor import FuncVisitor, _elided_matrix, _is_elided
+from .output import Output
+from .source_cache import eqtex_source_cache
+from .source_visitor import find_function
+
+
+def _format_number(value, precision):
+    if isinstance(value, bool):
+        return rf'\mathrm{{{value}}}'
+    elif isinstance(value, numbers.Integral):
+        return str(int(value))
+    elif not isinstance(value, numbers.Real):
+        return None
+
+    text = f'{float(value):.{precision}g}'
+    if text in ('inf', '-inf'):
+        return text.replace('inf', r'\infty')
+    elif text == 'nan':
+        return r'\mathrm{NaN}'
+
+    mantissa, _, exponent = text.partition('e')
+    return rf'{mantissa} \cdot 10^{{{int(exponent)}}}' if exponent else text
+
+
+def _format_value(value, config):
+    precision = config.capture_precision
+    # numpy arrays and scalars are recognised by their interface, so numpy is never imported here
+    if not (hasattr(value, 'ndim') and hasattr(value, 'item') and hasattr(value, 'dtype')):
+        return _format_number(value, precision)
+    elif value.dtype.kind not in 'biuf' or value.ndim > 2:
+        return None
+    elif value.ndim == 0:
+        return _format_number(value.item(), precision)
+
+    if value.ndim == 1:
+        rows, cols = 1, value.shape[0]
+        cell = lambda i, j: _format_number(value.item(j), precision)
+    else:
+        rows, cols = value.shape
+        cell = lambda i, j: _format_number(value.item(i, j), precision)
+
+    vals = _elided_matrix(rows, cols, cell, config.max_matrix_size, config.matrix_corner_size)
+    if _is_elided(max(rows, cols), config.max_matrix_size, config.matrix_corner_size):
+        return rf'\begin{{bmatrix}}{vals}\end{{bmatrix}}_{{{rows} \times {cols}}}'
+    return rf'\begin{{bmatrix}}{vals}\end{{bmatrix}}'
+
+
+def _trace_call(func, args, kwargs):
+    code = func.__code__
+    # Locals seen before and after the first execution of each line, later runs (loops) are not copied
+    snapshots = {}
+    pending = None
+    remaining = {line for _, line in dis.findlinestarts(code)}
+    started = False
+    # Debuggers and coverage keep seeing every event, the capture only listens in
+    previous = sys.gettrace()
+    local = None
+
+    def trace_lines(frame, event, arg):
+        nonlocal local, pending
+        if event in ('line', 'return') and (pending or frame.f_lineno not in snapshots):
+            values = dict(frame.f_locals)
+            if pending:
+                snapshots[pending[0]] = (pending[1], values)
+                remaining.discard(pending[0])
+                pending = None
+            if event == 'line' and frame.f_lineno not in snapshots:
+                pending = (frame.f_lineno, values)
+
+        if local:
+            local = local(frame, event, arg)
+        # Once every line has its snapshot the frame is left to the previous tracer
+        return trace_lines if remaining or pending else local
+
+    def trace_calls(frame, event, arg):
+        nonlocal local, started
+        traced = previous(frame, event, arg) if previous else None
+        if frame.f_code is code and not started:
+            started = True
+            local = traced
+            return trace_lines
+        return traced
+
+    sys.settrace(trace_calls)
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        sys.settrace(previous)
+    return result, snapshots
+
+
+class RunVisitor(FuncVisitor):
+    def __init__(self, config, snapshots):
+        super().__init__(config, keep_tex=False)
+        self.snapshots = snapshots
+        self.values = {}
+        self.texts = {}
+        self.run_tex = []
+
+    def format(self, values, name):
+        if name not in values:
+            return None
+        return _format_value(values[name], self.config)
+
+    def get_token(self, name):
+        text = self.texts.get(name)
+        if text is None and name not in self.texts:
+            text = self.texts[name] = self.format(self.values, name)
+        if text is None:
+            return None
+        return Text(rf'\left({text}\right)' if text.startswith('-') else text)
+
+    def visit_FunctionDef(self, func):
+        if self.func_name:
+            return
+
+        self.func_name = func.name
+        for stmt in func.body:
+            if stmt.lineno not in self.snapshots:
+                continue
+
+            self.values, after = self.snapshots[stmt.lineno]
+            self.texts = {}
+            expr = self.process(stmt)
+            if not expr:
+                continue
+
+            tex = expr.val()
+            if isinstance(stmt, ast.Assign) and isinstance(stmt.targets[0], ast.Name):
+                name = stmt.targets[0].id
+                result = self.format(after, name)
+                if result is not None and tex != f'{name}={result}':
+                    tex = f'{tex}={result}'
+            self.run_tex.append(tex)
+
+
+def _render(func, file_path, output, config, snapshots):
+    _, nodes = find_function(eqtex_source_cache.functions(file_path), func)
+    if not nodes:
+        return
+
+    prefix, node = nodes[-1]
+    visitor = RunVisitor(config, snapshots)
+    visitor.visit(node)
+    with output.lock():
+        output.process(node.name, list(prefix), Output.EqType.RUN, visitor.run_tex, config)
+        output.flush()
+
+
+def capture(func, file_path, output, config):
+    rate = config.capture_rate
+    max_captures = config.capture_max if config.capture_max is not None else float('inf')
+    captures = 0
+    lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        nonlocal captures
+        if captures >= max_captures or (rate < 1 and random.random() >= rate):
+            return func(*args, **kwargs)
+
+        with lock:
+            sampled = captures < max_captures
+            captures += sampled
+        if not sampled:
+            return func(*args, **kwargs)
+
+        result, snapshots = _trace_call(func, args, kwargs)
+        _render(func, file_path, output, config, snapshots)
+        return result
+
+    return wrapper
@@ -15,21 +15,135 @@
 # You should have received a copy of the GNU Lesser Public License
 # along with EqTex. If not, see <http://www.gnu.org/licenses/>.
 
+import threading
+
+_OPTIONS = (
+    # Global
+    ('enabled', True),
+    ('lazy', False),
+    ('stats', False),
+    ('sym_equation', True),
+    ('val_equation', True),
+    ('skip_self', True),
+
+    # Max length of values substituted into value equations, None disables the limit
+    ('val_expand_limit', None),
+
+    # Generated matrices with more rows or columns are elided, None disables it
+    ('max_matrix_size', 20),
+
+    # numpy.array literals with more rows or columns are elided, None disables it
+    ('max_array_size', None),
+
+    # Rows and columns kept in each corner of elided matrices
+    ('matrix_corner_size', 1),
+
+    # Wrap decorated functions and render equations with the values of sampled calls
+    ('capture', False),
+
+    # Fraction of calls captured and max captures per function, None disables the limit
+    ('capture_rate', 1.0),
+    ('capture_max', 1),
+
+    # Significant digits of captured floats
+    ('capture_precision', 4),
+
+    # File output
+    ('file_output_single_eq', True),
+
+    # Path of the incremental build manifest, None disables it
+    ('build_cache', None),
+)
+
+_NAMES = tuple(name for name, _ in _OPTIONS)
+
+
+def _from_values(values):
+    config = object.__new__(Config)
+    for name, value in zip(_NAMES, values):
+        object.__setattr__(config, name, value)
+    object.__setattr__(config, '_values', values)
+    object.__setattr__(config, '_hash', hash(values))
+    return config
+
 
 class Config:
+    __slots__ = _NAMES + ('_values', '_hash')
+
+    def __new__(cls, **options):
+        return Config._default.replace(**options) if options else Config._default
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'Config is immutable, use replace({name}=...) instead')
+
+    def __delattr__(self, name):
+        raise AttributeError('Config is immutable')
+
+    def replace(self, **overrides):
+        if not overrides:
+            return self
+
+        unknown = overrides.keys() - set(_NAMES)
+        if unknown:
+            raise TypeError(f'Unknown config option(s): {", ".join(sorted(unknown))}')
+        values = tuple(overrides.get(name, value) for name, value in zip(_NAMES, self._values))
+        return self if values == self._values else _from_values(values)
+
+    def items(self):
+        return zip(_NAMES, self._values)
+
+    def __eq__(self, other):
+        return isinstance(other, Config) and self._values == other._values
+
+    def __hash__(self):
+        return self._hash
+
+    def __repr__(self):
+        return f'Config({", ".join(f"{name}={value!r}" for name, value in self.items())})'
+
+    def __reduce__(self):
+        return _from_values, (self._values,)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+Config._default = _from_values(tuple(value for _, value in _OPTIONS))
+
+
+class GlobalConfig:
+    __slots__ = ('_config', '_lock')
+
     def __init__(self):
+        object.__setattr__(self, '_lock', threading.Lock())
         self.reset()
 
-    def reset(self):
-        # Global
-        self.enabled = True
-        self.sym_equation = True
-        self.val_equation = True
-        self.skip_self = True
+    def __getattr__(self, name):
+        # Private names are never options, and must not recurse while a copy has no _config yet
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self._config, name)
 
-        # File output
-        self.file_output_single_eq = True
+    def __setattr__(self, name, value):
+        with self._lock:
+            object.__setattr__(self, '_config', self._config.replace(**{name: value}))
 
+    def __copy__(self):
+        config = GlobalConfig()
+        object.__setattr__(config, '_config', self._config)
+        return config
+
+    def __deepcopy__(self, memo):
+        return self.__copy__()
+
+    def snapshot(self):
+        return self._config
+
+    def reset(self):
+        object.__setattr__(self, '_config', Config())
 
-eqtex_config = Config()
 
+eqtex_config = GlobalConfig()
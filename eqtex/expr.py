@@ -0,0 +1,143 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+_template_sizes = {}
+
+
+def _expr(node):
+    return Text(str(node)) if node is None else node
+
+
+def _val_size(children):
+    size = 0
+    for c in children:
+        size += c.val_size
+    return size
+
+
+def _substituted(children):
+    for c in children:
+        if c.substituted:
+            return True
+    return False
+
+
+def _template_size(template, count):
+    size = _template_sizes.get(template)
+    if size is None:
+        size = _template_sizes[template] = len(template.format(*(count * [''])))
+    return size
+
+
+class Expr:
+    __slots__ = ('val_size', 'substituted', '_sym', '_val')
+
+    def __init__(self, val_size, substituted):
+        self.val_size = val_size
+        self.substituted = substituted
+        self._sym = None
+        self._val = None
+
+    def sym(self):
+        if self._sym is None:
+            self._sym = self.render_sym()
+        return self._sym
+
+    def val(self):
+        if not self.substituted:
+            return self.sym()
+        if self._val is None:
+            self._val = self.render_val()
+        return self._val
+
+
+class Text(Expr):
+    __slots__ = ('text',)
+
+    def __init__(self, text):
+        super().__init__(len(text), False)
+        self.text = text
+
+    def render_sym(self):
+        return self.text
+
+    def render_val(self):
+        return self.text
+
+
+class Name(Expr):
+    __slots__ = ('name', 'value')
+
+    def __init__(self, name, value=None):
+        super().__init__(value.val_size if value is not None else len(name), value is not None)
+        self.name = name
+        self.value = value
+
+    def render_sym(self):
+        return self.name
+
+    def render_val(self):
+        return self.value.val() if self.value is not None else self.name
+
+
+class Format(Expr):
+    __slots__ = ('template', 'children')
+
+    def __init__(self, template, *children):
+        if None in children:
+            children = [_expr(c) for c in children]
+        super().__init__(_template_size(template, len(children)) + _val_size(children), _substituted(children))
+        self.template = template
+        self.children = children
+
+    def render_sym(self):
+        return self.template.format(*[c.sym() for c in self.children])
+
+    def render_val(self):
+        return self.template.format(*[c.val() for c in self.children])
+
+
+class Join(Expr):
+    __slots__ = ('separator', 'children')
+
+    def __init__(self, separator, children):
+        if None in children:
+            children = [_expr(c) for c in children]
+        super().__init__(len(separator) * max(0, len(children) - 1) + _val_size(children), _substituted(children))
+        self.separator = separator
+        self.children = children
+
+    def render_sym(self):
+        return self.separator.join([c.sym() for c in self.children])
+
+    def render_val(self):
+        return self.separator.join([c.val() for c in self.children])
+
+
+class Split(Expr):
+    __slots__ = ('sym_expr', 'val_expr')
+
+    def __init__(self, sym_expr, val_expr):
+        super().__init__(val_expr.val_size, True)
+        self.sym_expr = sym_expr
+        self.val_expr = val_expr
+
+    def render_sym(self):
+        return self.sym_expr.sym()
+
+    def render_val(self):
+        return self.val_expr.val()
@@ -15,19 +15,109 @@
 # You should have received a copy of the GNU Lesser Public License
 # along with EqTex. If not, see <http://www.gnu.org/licenses/>.
 
+import filecmp
+import os
+import threading
+
 from .output import Output
 
 
+def _tmp_name(name):
+    return f'{name}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
 class _FileOutput(Output):
+    def __init__(self):
+        self.written = 0
+        self.skipped = 0
+        self.streams = {}
+
+    def write(self, name, tex):
+        try:
+            with open(name, 'r') as f:
+                if f.read() == tex:
+                    self.skipped += 1
+                    return
+        except OSError:
+            pass
+
+        tmp_name = _tmp_name(name)
+        try:
+            with open(tmp_name, 'w') as f:
+                f.write(tex)
+            os.replace(tmp_name, name)
+        except BaseException:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+            raise
+
+        self.written += 1
+
     def process(self, func_name, cls_prefix, eq_type, tex, config):
         base_name = f'{"_".join(cls_prefix)}_{func_name}_{eq_type.value}'
         if config.file_output_single_eq:
-            tex = r'\\'.join(tex)
             name = f'{base_name}.tex'
-            with open(name, 'w') as f:
-                f.write(tex)
+            self.write(name, r'\\'.join(tex))
+            return [name]
         else:
+            names = []
             for i in range(len(tex)):
                 name = f'{base_name}_{i}.tex'
-                with open(name, 'w') as f:
-                    f.write(tex[i])
+                self.write(name, tex[i])
+                names.append(name)
+            return names
+
+    def commit(self, tmp_name, name):
+        if os.path.exists(name) and filecmp.cmp(tmp_name, name, shallow=False):
+            os.remove(tmp_name)
+            self.skipped += 1
+        else:
+            os.replace(tmp_name, name)
+            self.written += 1
+
+    def begin_function(self, func_name, cls_prefix, config):
+        self.config = config
+        self.base_name = f'{"_".join(cls_prefix)}_{func_name}'
+        self.names = []
+        self.counts = {}
+        self.streams = {}
+
+        if config.file_output_single_eq:
+            eq_types = []
+            if config.sym_equation:
+                eq_types.append(Output.EqType.SYM)
+            if config.val_equation:
+                eq_types.append(Output.EqType.NUM)
+
+            for eq_type in eq_types:
+                name = f'{self.base_name}_{eq_type.value}.tex'
+                tmp_name = _tmp_name(name)
+                self.streams[eq_type] = [name, tmp_name, open(tmp_name, 'w'), 0]
+
+    def equation(self, eq_type, tex):
+        if self.config.file_output_single_eq:
+            stream = self.streams[eq_type]
+            if stream[3]:
+                stream[2].write(r'\\')
+            stream[2].write(tex)
+            stream[3] += 1
+        else:
+            i = self.counts.get(eq_type, 0)
+            self.counts[eq_type] = i + 1
+            name = f'{self.base_name}_{eq_type.value}_{i}.tex'
+            self.write(name, tex)
+            self.names.append(name)
+
+    def end_function(self):
+        for name, tmp_name, f, _ in self.streams.values():
+            f.close()
+            self.commit(tmp_name, name)
+            self.names.append(name)
+        self.streams = {}
+        return self.names
+
+    def abort_function(self):
+        for _, tmp_name, f, _ in self.streams.values():
+            f.close()
+            os.remove(tmp_name)
+        self.streams = {}
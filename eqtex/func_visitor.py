@@ -17,71 +17,137 @@
 
 import ast
 
+from .expr import Format, Join, Name, Split, Text
+from .output import Output
 from .visitor import Visitor
 
 
+_PRECEDENSE = {
+    ast.Pow: 2,
+    ast.MatMult: 1,
+    ast.Mult: 1,
+    ast.Div: 1,
+    ast.Add: 0,
+    ast.Sub: 0,
+}
+
+
+def _is_elided(count, max_size, corner):
+    return max_size is not None and count > max(max_size, 2 * corner)
+
+
+def _visible(count, max_size, corner):
+    if not _is_elided(count, max_size, corner):
+        return range(count)
+    return list(range(corner)) + [None] + list(range(count - corner, count))
+
+
+def _elided_grid(rows, cols, cell, max_size, corner=1):
+    visible_cols = _visible(cols, max_size, corner)
+    for i in _visible(rows, max_size, corner):
+        if i is None:
+            yield [r'\ddots' if j is None else r'\vdots' for j in visible_cols]
+        else:
+            yield [r'\cdots' if j is None else cell(i, j) for j in visible_cols]
+
+
+def _elided_matrix(rows, cols, cell, max_size, corner=1):
+    return r'\\'.join('&'.join(line) for line in _elided_grid(rows, cols, cell, max_size, corner))
+
+
+def _literal(node):
+    if isinstance(node, ast.Num):
+        return str(node.n)
+    elif isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Num):
+        return f' - {node.operand.n}'
+    return None
+
+
+def _literal_rows(rows):
+    literals = []
+    for row in rows:
+        line = [_literal(val) for val in row]
+        if None in line:
+            return None
+        literals.append(line)
+    return literals
+
+
 class FuncVisitor(Visitor):
-    def __init__(self, config):
+    def __init__(self, config, on_equation=None, keep_tex=True):
         self.tokens = {}
         self.func_name = None
         self.config = config
+        self.on_equation = on_equation
+        self.keep_tex = keep_tex
         self.sym_tex = []
         self.val_tex = []
 
+    def emit(self, eq_type, tex):
+        if self.keep_tex:
+            if eq_type == Output.EqType.SYM:
+                self.sym_tex.append(tex)
+            else:
+                self.val_tex.append(tex)
+        if self.on_equation:
+            self.on_equation(eq_type, tex)
+
     def get_precedense(self, op):
-        return {
-            ast.Pow: 2,
-            ast.MatMult: 1,
-            ast.Mult: 1,
-            ast.Div: 1,
-            ast.Add: 0,
-            ast.Sub: 0,
-        }[op.__class__]
+        return _PRECEDENSE[op.__class__]
+
+    def get_token(self, name):
+        value = self.tokens.get(name)
+        limit = self.config.val_expand_limit
+        if value is not None and limit is not None and value.val_size > limit:
+            return None
+        return value
+
+    def is_elided(self, *sizes):
+        return _is_elided(max(sizes), self.config.max_matrix_size, self.config.matrix_corner_size)
 
     def create_matrix(self, args, val):
         rows = args[0].elts[0].n
         cols = args[0].elts[1].n
+        if self.is_elided(rows, cols):
+            vals = _elided_matrix(rows, cols, lambda i, j: val, self.config.max_matrix_size,
+                                  self.config.matrix_corner_size)
+            return Text(r'\begin{{bmatrix}}{0}\end{{bmatrix}}_{{{1} \times {2}}}'.format(vals, rows, cols))
+
         p = r'\begin{{bmatrix}}{0}\end{{bmatrix}}'
         vals = r'\\'.join(rows * [r'&'.join(cols * [val])])
-        return p.format(vals), p.format(vals)
+        return Text(p.format(vals))
 
     def process_Name(self, val):
-        return val.id, self.tokens.get(val.id, val.id)
+        return Name(val.id, self.get_token(val.id))
 
     def process_Num(self, val):
-        return str(val.n), str(val.n)
+        return Text(str(val.n))
 
     def process_numpy_invert(self, args):
-        sym, val = self.process(args[0])
         if isinstance(args[0], ast.BinOp):
             p = r'{{\left({0}\right)}}^{{-1}}'
         else:
             p = r'{{{0}}}^{{-1}}'
 
-        return p.format(sym), p.format(val)
+        return Format(p, self.process(args[0]))
 
     def process_numpy_transpose(self, args):
-        sym = args[0].id
-        val = self.tokens.get(sym, sym)
-        p = '{{{0}}}^{{T}}'
-        return p.format(sym), p.format(val)
+        name = args[0].id
+        return Format('{{{0}}}^{{T}}', Name(name, self.get_token(name)))
 
     def process_numpy_eye(self, args):
         size = args[0].n
-        rows = []
-        row = [str(val) for val in [1] + (size - 1) * [0]]
-        for _ in range(size):
-            rows.append('&'.join(row))
-            row = row[-1:] + row[:-1]
+        if self.is_elided(size):
+            vals = _elided_matrix(size, size, lambda i, j: '1' if i == j else '0', self.config.max_matrix_size,
+                                  self.config.matrix_corner_size)
+        else:
+            vals = r'\\'.join(['0&' * i + '1' + '&0' * (size - i - 1) for i in range(size)])
 
-        return r'I_{{{0}}}'.format(str(size)), \
-               r'\begin{{bmatrix}}{0}\end{{bmatrix}}_{{{1}}}'.format(r'\\'.join(rows), str(size))
+        return Split(Text(r'I_{{{0}}}'.format(str(size))),
+                     Text(r'\begin{{bmatrix}}{0}\end{{bmatrix}}_{{{1}}}'.format(vals, str(size))))
 
     def process_numpy_divide(self, args):
-        l_sym, l_val = self.process(args[0])
-        r_sym, r_val = self.process(args[1])
-        p = r'\frac{{{0}}}{{{1}}}'
-        return p.format(l_sym, r_sym), p.format(l_val, r_val)
+        return Format(r'\frac{{{0}}}{{{1}}}', self.process(args[0]), self.process(args[1]))
 
     def process_numpy_ones(self, args):
         return self.create_matrix(args, '1')
@@ -89,22 +155,32 @@ class FuncVisitor(Visitor):
     def process_numpy_zeros(self, args):
         return self.create_matrix(args, '0')
 
-    def process_numpy_array(self, args):
-        sym_rows = []
-        val_rows = []
+    def array_cell(self, val):
+        literal = _literal(val)
+        return self.process(val) if literal is None else Text(literal)
 
+    def process_numpy_array(self, args):
         if isinstance(args[0].elts[0], ast.List):
-            for row in args[0].elts:
-                syms, vals = zip(*[self.process(val) for val in row.elts])
-                sym_rows.append('&'.join(syms))
-                val_rows.append('&'.join(vals))
+            rows = [row.elts for row in args[0].elts]
         else:
-            syms, vals = zip(*[self.process(val) for val in args[0].elts])
-            sym_rows.append('&'.join(syms))
-            val_rows.append('&'.join(vals))
+            rows = [args[0].elts]
 
         p = r'\begin{{bmatrix}}{0}\end{{bmatrix}}'
-        return p.format(r'\\'.join(sym_rows)), p.format(r'\\'.join(val_rows))
+        max_size = self.config.max_array_size
+        # Ragged literals have no corners to show, they are translated in full
+        regular = all(len(row) == len(rows[0]) for row in rows)
+        if regular and _is_elided(max(len(rows), len(rows[0])), max_size, self.config.matrix_corner_size):
+            # Only the corner cells are translated, so the result stays small whatever the array size
+            grid = _elided_grid(len(rows), len(rows[0]), lambda i, j: self.array_cell(rows[i][j]), max_size,
+                                self.config.matrix_corner_size)
+            cells = Join(r'\\', [Join('&', [Text(c) if isinstance(c, str) else c for c in line]) for line in grid])
+            return Format(p + r'_{{{1} \times {2}}}', cells, Text(str(len(rows))), Text(str(len(rows[0]))))
+
+        literals = _literal_rows(rows)
+        if literals is not None:
+            return Text(p.format(r'\\'.join('&'.join(row) for row in literals)))
+
+        return Format(p, Join(r'\\', [Join('&', [self.process(val) for val in row]) for row in rows]))
 
     def process_Call(self, val):
         if isinstance(val.func, ast.Name):
@@ -118,13 +194,11 @@ class FuncVisitor(Visitor):
         p = r'\left({0}\right)'
 
         if isinstance(val.left, ast.BinOp):
-            l_sym, l_val = l
             if (self.get_precedense(val.left.op) < self.get_precedense(val.op)) and not isinstance(val.op, ast.Div):
-                l = [p.format(l_sym), p.format(l_val)]
+                l = Format(p, l)
         if isinstance(val.right, ast.BinOp):
-            r_sym, r_val = r
             if (self.get_precedense(val.right.op) < self.get_precedense(val.op)) and not isinstance(val.op, ast.Div):
-                l = [p.format(r_sym), p.format(r_val)]
+                r = Format(p, r)
 
         return self.process(val.op, l, r)
 
@@ -132,51 +206,30 @@ class FuncVisitor(Visitor):
         return self.process(stmt.op, stmt.operand)
 
     def process_Mult(self, _, l, r):
-        l_sym, l_val = l
-        r_sym, r_val = r
-        p = r'{0} \cdot {1}'
-        return p.format(l_sym, r_sym), p.format(l_val, r_val)
+        return Format(r'{0} \cdot {1}', l, r)
 
     def process_Sub(self, _, l, r):
-        l_sym, l_val = l
-        r_sym, r_val = r
-        p = r'{0} - {1}'
-        return p.format(l_sym, r_sym), p.format(l_val, r_val)
+        return Format(r'{0} - {1}', l, r)
 
     def process_Div(self, _, l, r):
-        l_sym, l_val = l
-        r_sym, r_val = r
-        p = r'\frac{{{0}}}{{{1}}}'
-        return p.format(l_sym, r_sym), p.format(l_val, r_val)
+        return Format(r'\frac{{{0}}}{{{1}}}', l, r)
 
     def process_Add(self, _, l, r):
-        l_sym, l_val = l
-        r_sym, r_val = r
-        p = r'{0} + {1}'
-        return p.format(l_sym, r_sym), p.format(l_val, r_val)
+        return Format(r'{0} + {1}', l, r)
 
     def process_MatMult(self, _, l, r):
-        l_sym, l_val = l
-        r_sym, r_val = r
-        p = r'{0} \, {1}'
-        return p.format(l_sym, r_sym), p.format(l_val, r_val)
+        return Format(r'{0} \, {1}', l, r)
 
     def process_USub(self, _, stmt):
-        sym, val = self.process(stmt)
+        expr = self.process(stmt)
 
         if isinstance(stmt, ast.BinOp):
-            p = r'\left({0}\right)'
-            sym, val = p.format(sym), p.format(val)
+            expr = Format(r'\left({0}\right)', expr)
 
-        p = r' - {0}'
-        return p.format(sym), p.format(val)
+        return Format(r' - {0}', expr)
 
     def process_Pow(self, _, l, r):
-        l_sym, l_val = l
-        r_sym, r_val = r
-
-        p = r'{{{0}}}^{{{1}}}'
-        return p.format(l_sym, r_sym), p.format(l_val, r_val)
+        return Format(r'{{{0}}}^{{{1}}}', l, r)
 
     def process_Assign(self, stmt):
         if len(stmt.targets) > 2:
@@ -185,21 +238,17 @@ class FuncVisitor(Visitor):
             vals = [stmt.value]
 
         for target, val in zip(stmt.targets, vals):
-            name, _ = self.process(target)
-            sym, val = self.process(val)
-            self.tokens[name] = val
-            return f'{name}={sym}', f'{name}={val}'
+            name = self.process(target).sym()
+            expr = self.process(val) or Text('None')
+            self.tokens[name] = expr
+            return Format('{0}={1}', Text(name), expr)
 
     def process_Attribute(self, attr):
         if attr.value.id == 'self':
             if not self.config.skip_self:
-                sym = f'self.{attr.attr}'
-                val = self.tokens.get(attr.attr, attr.attr)
-                if val == attr.attr:
-                    val = f'self.{val}'
-                return sym, val
+                return Name(f'self.{attr.attr}', self.get_token(attr.attr))
             else:
-                return attr.attr, self.tokens.get(attr.attr, attr.attr)
+                return Name(attr.attr, self.get_token(attr.attr))
         elif attr.attr == 'T':
             return self.process_numpy_transpose([attr.value])
         else:
@@ -211,9 +260,12 @@ class FuncVisitor(Visitor):
 
         self.func_name = func.name
 
+        sym_equation = self.config.sym_equation
+        val_equation = self.config.val_equation
         for stmt in func.body:
-            sym, val = self.process(stmt)
-            if sym:
-                self.sym_tex.append(sym)
-            if val:
-                self.val_tex.append(val)
+            expr = self.process(stmt)
+            if expr:
+                if sym_equation:
+                    self.emit(Output.EqType.SYM, expr.sym())
+                if val_equation:
+                    self.emit(Output.EqType.NUM, expr.val())
@@ -0,0 +1,100 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import os
+import shutil
+import threading
+
+
+def _default_path():
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'eqtex', 'preview')
+
+
+def _link(src, dst):
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        return
+
+    tmp_dst = f'{dst}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        os.link(src, tmp_dst)
+    except OSError:
+        shutil.copyfile(src, tmp_dst)
+    os.replace(tmp_dst, dst)
+
+
+class ImageCache:
+    def __init__(self, path=None, max_size=256 * 1024 * 1024):
+        self.path = path or _default_path()
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Total size of the entries, unknown until the first scan of the directory
+        self.size = None
+        os.makedirs(self.path, exist_ok=True)
+
+    def key(self, *parts):
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(repr(part).encode())
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.path, f'{key}.png')
+
+    def fetch(self, key, name):
+        entry_path = self._entry_path(key)
+        try:
+            _link(entry_path, name)
+            os.utime(entry_path)
+        except OSError:
+            self.misses += 1
+            return False
+
+        self.hits += 1
+        return True
+
+    def store(self, key, name):
+        entry_path = self._entry_path(key)
+        existed = os.path.exists(entry_path)
+        _link(name, entry_path)
+        if self.size is not None and not existed:
+            self.size += os.path.getsize(entry_path)
+
+    def evict(self):
+        if self.size is not None and self.size <= self.max_size:
+            return
+
+        entries = []
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.endswith('.png'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, entry_path in sorted(entries):
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(entry_path)
+            except OSError:
+                pass
+            total_size -= size
+        self.size = total_size
@@ -17,40 +17,318 @@
 
 import argparse
 import ast
+import concurrent.futures
+import fnmatch
+import itertools
 import os
+import sys
+import time
 
+from .build_cache import function_hash, get_build_cache, source_hash
+from .bundle_output import BundleOutput
+from .config import eqtex_config
 from .file_output import _FileOutput
-from .source_visitor import SourceVisitor
+from .output import Output
+from .source_cache import eqtex_source_cache
+from .source_visitor import FunctionIndex, SourceVisitor
+from .stats import Stats, eqtex_stats
+
+
+class _Recorder(Output):
+    def __init__(self):
+        self.records = []
+        self._begin = 0
+
+    def begin_function(self, func_name, cls_prefix, config):
+        self._begin = len(self.records)
+        self.records.append((func_name, tuple(cls_prefix)))
+
+    def equation(self, eq_type, tex):
+        self.records.append((eq_type, tex))
+
+    def end_function(self):
+        self.records.append(None)
+        return []
+
+    def abort_function(self):
+        del self.records[self._begin:]
+
+
+def _replay(records, config, output):
+    # Records are begin (func_name, cls_prefix), equation (eq_type, tex) and end (None) events
+    outputs = []
+    with output.lock():
+        for record in records:
+            if record is None:
+                outputs.extend(output.end_function() or [])
+            elif isinstance(record[0], Output.EqType):
+                output.equation(*record)
+            else:
+                output.begin_function(record[0], list(record[1]), config)
+    return outputs
 
 
 def _handle_cmg_args():
     p = argparse.ArgumentParser()
     p.add_argument('sources', help='Python file or src directory', type=str)
+    p.add_argument('-i', '--include', help='Glob of files to process in src directory (default: *.py)',
+                   action='append', default=[])
+    p.add_argument('-e', '--exclude', help='Glob of files or directories to skip in src directory',
+                   action='append', default=[])
+    p.add_argument('-j', '--jobs', help='Number of worker processes (0: one per CPU)', type=int, default=1)
+    p.add_argument('--cache', help='Incremental build manifest (default: .eqtex_cache.json)', type=str,
+                   default='.eqtex_cache.json')
+    p.add_argument('--no-cache', help='Regenerate all outputs', dest='cache', action='store_const', const=None)
+    p.add_argument('--bundle', help='Store all equations in one SQLite file (and a .tex file next to it)', type=str)
+    p.add_argument('--stats', help='Print per-file and per-function timings', action='store_true')
+    p.add_argument('-w', '--watch', help='Keep running and re-render functions changed in source files',
+                   action='store_true')
+    p.add_argument('--interval', help='Polling interval of --watch in seconds (default: 1.0)', type=float,
+                   default=1.0)
     return p.parse_args()
 
 
+def _matches(path, patterns):
+    return any(fnmatch.fnmatch(path, p) or fnmatch.fnmatch(os.path.basename(path), p) for p in patterns)
+
+
 def _find_file_paths(cmd_args):
     if os.path.isfile(cmd_args.sources):
         return [cmd_args.sources]
+    elif not os.path.isdir(cmd_args.sources):
+        raise RuntimeError(f'{cmd_args.sources} is neither a file nor a directory')
+
+    include = cmd_args.include or ['*.py']
+    file_paths = []
+    for dir_path, dir_names, file_names in os.walk(cmd_args.sources):
+        dir_names[:] = sorted(d for d in dir_names if not _matches(os.path.join(dir_path, d), cmd_args.exclude))
+        for file_name in sorted(file_names):
+            file_path = os.path.join(dir_path, file_name)
+            if _matches(file_path, include) and not _matches(file_path, cmd_args.exclude):
+                file_paths.append(file_path)
+
+    return sorted(file_paths)
+
+
+def _process_file(file_path, config, known_hashes=None):
+    stats = Stats() if config.stats else None
+    start = time.perf_counter()
+    try:
+        with open(file_path, 'r') as file:
+            source = file.read()
+        read_time = time.perf_counter()
+        tree = ast.parse(source)
+        parse_time = time.perf_counter()
+        index = FunctionIndex()
+        index.visit(tree)
+    except Exception as e:
+        # One broken module should not stop the rest of the tree from being processed
+        print(f'{file_path}: skipped, {type(e).__name__}: {e}', file=sys.stderr)
+        return None, stats
+
+    if stats:
+        stats.add_file(file_path, read=read_time - start, parse=parse_time - read_time,
+                       index=time.perf_counter() - parse_time, source_bytes=len(source))
+
+    functions = []
+    for qualname, nodes in index.functions.items():
+        func_hash = function_hash(node for _, node in nodes)
+        if known_hashes and known_hashes.get(qualname) == func_hash:
+            if stats:
+                stats.add_function(file_path, qualname, skipped=1)
+            functions.append((qualname, func_hash, None))
+            continue
+
+        recorder = _Recorder()
+        visitor = SourceVisitor(None, recorder, config, stats=stats, file_path=file_path)
+        for prefix, node in nodes:
+            visitor.process_function(prefix, node)
+        if stats:
+            # Recording is part of the translation, the output itself is timed when the records are replayed
+            values = stats.functions[(os.path.abspath(file_path), qualname)]
+            values['translate'] += values.pop('output', 0)
+        functions.append((qualname, func_hash, recorder.records))
+
+    return functions, stats
+
+
+def _store_records(tasks, results, config, cache, output):
+    for (file_path, file_hash, _), (functions, stats) in zip(tasks, results):
+        if stats:
+            eqtex_stats.merge(stats)
+        if functions is None:
+            continue
+
+        for qualname, func_hash, records in functions:
+            if records is None:
+                if cache:
+                    cache.skipped += 1
+                continue
+
+            start = time.perf_counter()
+            outputs = _replay(records, config, output)
+            if stats:
+                eqtex_stats.add_function(file_path, qualname, output=time.perf_counter() - start)
+            if cache:
+                cache.update_function(file_path, qualname, func_hash, outputs, config)
+
+        if cache:
+            cache.update_file(file_path, file_hash, [qualname for qualname, _, _ in functions])
+
+
+def _process_files(file_paths, jobs=1, cache=None, output=None):
+    global eqtex_config
+    config = eqtex_config.snapshot()
+    output = output or _FileOutput()
+
+    tasks = []
+    for file_path in file_paths:
+        if cache:
+            file_hash = source_hash(file_path)
+            if cache.is_file_fresh(file_path, file_hash, config):
+                continue
+            tasks.append((file_path, file_hash, cache.function_hashes(file_path, config)))
+        else:
+            tasks.append((file_path, None, None))
+
+    task_args = ([t[0] for t in tasks], itertools.repeat(config), [t[2] for t in tasks])
+    if jobs == 1 or len(tasks) < 2:
+        _store_records(tasks, map(_process_file, *task_args), config, cache, output)
     else:
-        raise RuntimeError('TODO')
+        jobs = jobs or os.cpu_count() or 1
+        chunk_size = max(1, len(tasks) // (4 * jobs))
+        with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+            _store_records(tasks, executor.map(_process_file, *task_args, chunksize=chunk_size), config, cache,
+                           output)
+
+    output.flush()
+    if cache:
+        cache.save()
+
+    return output
+
+
+def _file_state(file_path):
+    stat = os.stat(file_path)
+    functions = eqtex_source_cache.functions(file_path)
+    hashes = {qualname: function_hash(node for _, node in nodes) for qualname, nodes in functions.items()}
+    return (stat.st_mtime_ns, stat.st_size), hashes
+
+
+def _file_states(file_paths):
+    states = {}
+    for file_path in file_paths:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        try:
+            states[file_path] = _file_state(file_path)
+        except Exception as e:
+            # Half-edited files are expected while watching, their functions are rendered once they parse
+            print(f'{file_path}: {type(e).__name__}: {e}', file=sys.stderr)
+            states[file_path] = ((stat.st_mtime_ns, stat.st_size), {})
+    return states
+
+
+def _update_file(file_path, state, cache, output):
+    global eqtex_config
+    config = eqtex_config.snapshot()
+    new_state = _file_state(file_path)
+    functions = eqtex_source_cache.functions(file_path)
 
+    updated = []
+    for qualname, func_hash in new_state[1].items():
+        if state and state[1].get(qualname) == func_hash:
+            continue
 
-def _process_file(file_path):
-    with open(file_path, 'r') as file:
-        global eqtex_config
-        tree = ast.parse(file.read())
-        output = _FileOutput()
-        SourceVisitor(None, output, eqtex_config).visit(tree)
+        visitor = SourceVisitor(None, output, config)
+        for prefix, node in functions[qualname]:
+            visitor.process_function(prefix, node)
+        if cache:
+            cache.update_function(file_path, qualname, func_hash, visitor.outputs, config)
+        updated.append(qualname)
 
+    if cache:
+        cache.update_file(file_path, source_hash(file_path), list(new_state[1]))
+    return new_state, updated
 
-def _process_files(file_paths):
+
+def _poll(cmd_args, states, cache, output):
+    file_paths = _find_file_paths(cmd_args)
+    for file_path in set(states).difference(file_paths):
+        del states[file_path]
+
+    updated = []
     for file_path in file_paths:
-        _process_file(file_path)
+        state = states.get(file_path)
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        if state and state[0] == (stat.st_mtime_ns, stat.st_size):
+            continue
+
+        try:
+            states[file_path], qualnames = _update_file(file_path, state, cache, output)
+        except Exception as e:
+            # Keep the last good hashes so the next valid edit is compared against them.
+            print(f'{file_path}: {type(e).__name__}: {e}', file=sys.stderr)
+            states[file_path] = ((stat.st_mtime_ns, stat.st_size), state[1] if state else {})
+            continue
+
+        if qualnames:
+            print(f'{file_path}: {", ".join(qualnames)}')
+            updated.extend(qualnames)
+
+    if updated:
+        output.flush()
+        if isinstance(output, BundleOutput) and output.tex_path:
+            output.write_tex(output.tex_path)
+        if cache:
+            cache.save()
+    return updated
+
+
+def _watch(cmd_args, states, cache, output):
+    print(f'Watching {cmd_args.sources} (Ctrl+C to stop)')
+    try:
+        while True:
+            time.sleep(cmd_args.interval)
+            _poll(cmd_args, states, cache, output)
+    except KeyboardInterrupt:
+        pass
 
 
 def _main():
     cmd_args = _handle_cmg_args()
+    eqtex_config.stats = cmd_args.stats
     file_paths = _find_file_paths(cmd_args)
-    _process_files(file_paths)
+    if cmd_args.bundle:
+        target = f'{BundleOutput.__name__}:{os.path.abspath(cmd_args.bundle)}'
+    else:
+        target = _FileOutput.__name__
+    cache = get_build_cache(cmd_args.cache, target) if cmd_args.cache else None
+    # Taken before the first pass, so edits made while it runs are picked up by the first poll.
+    states = _file_states(file_paths) if cmd_args.watch else None
+
+    if cmd_args.bundle:
+        output = BundleOutput(cmd_args.bundle, f'{os.path.splitext(cmd_args.bundle)[0]}.tex')
+        _process_files(file_paths, cmd_args.jobs, cache, output)
+        if cmd_args.watch:
+            output.write_tex(output.tex_path)
+        summary = f'{output.written} equations written to {cmd_args.bundle}'
+    else:
+        output = _process_files(file_paths, cmd_args.jobs, cache)
+        summary = f'{output.written} files written, {output.skipped} unchanged'
+    if cache:
+        summary += f', {cache.skipped} functions up to date'
+    print(summary)
+
+    if cmd_args.stats:
+        print(eqtex_stats.report())
 
+    if cmd_args.watch:
+        _watch(cmd_args, states, cache, output)
+    if cmd_args.bundle:
+        output.close()
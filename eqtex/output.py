@@ -17,13 +17,75 @@
 
 import abc
 import enum
+import threading
+import weakref
+
+# Weak, outputs still in use are kept alive by the functions decorated with them
+_registered = weakref.WeakSet()
+_registered_lock = threading.Lock()
+
+
+def register_output(output):
+    with _registered_lock:
+        _registered.add(output)
+
+
+def unregister_output(output):
+    with _registered_lock:
+        _registered.discard(output)
+
+
+def registered_outputs():
+    with _registered_lock:
+        return list(_registered)
 
 
 class Output:
     class EqType(enum.Enum):
         SYM = 'sym'
         NUM = 'num'
+        RUN = 'run'
+
+    # Slots, so subclasses declaring __slots__ still have room for the lock and the streamed function
+    __slots__ = ('_lock', '_function', '__weakref__')
+    _lock_guard = threading.Lock()
+
+    def lock(self):
+        try:
+            return self._lock
+        except AttributeError:
+            with Output._lock_guard:
+                if not hasattr(self, '_lock'):
+                    self._lock = threading.RLock()
+            return self._lock
 
     @abc.abstractmethod
     def process(self, func_name, cls_prefix, eq_type, tex, config):
         pass
+
+    def begin_function(self, func_name, cls_prefix, config):
+        self._function = (func_name, list(cls_prefix), config, {Output.EqType.SYM: [], Output.EqType.NUM: []})
+
+    def equation(self, eq_type, tex):
+        self._function[3][eq_type].append(tex)
+
+    def end_function(self):
+        func_name, cls_prefix, config, tex = self._function
+        self._function = None
+
+        outputs = []
+        if config.sym_equation:
+            outputs.extend(self.process(func_name, cls_prefix, Output.EqType.SYM, tex[Output.EqType.SYM], config) or [])
+        if config.val_equation:
+            outputs.extend(self.process(func_name, cls_prefix, Output.EqType.NUM, tex[Output.EqType.NUM], config) or [])
+        return outputs
+
+    def abort_function(self):
+        self._function = None
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+        unregister_output(self)
@@ -15,24 +15,115 @@
 # You should have received a copy of the GNU Lesser Public License
 # along with EqTex. If not, see <http://www.gnu.org/licenses/>.
 
-import sympy as sp
+import concurrent.futures
+import os
+import shutil
+import subprocess
+import tempfile
 
-from .output import Output
+from .image_cache import ImageCache
+from .output import Output, register_output
 
+_PREAMBLE = r'\documentclass[12pt]{article}' '\n' \
+            r'\usepackage{amsmath}' '\n' \
+            r'\usepackage{amsfonts}' '\n' \
+            r'\usepackage[active,tightpage,displaymath]{preview}' '\n' \
+            r'\begin{document}' '\n'
 
-class PreviewOutput(Output):
-    def process(self, func_name, cls_prefix, eq_type, tex, config):
-        base_name = f'{"_".join(cls_prefix)}_{func_name}_{eq_type.value}'
-        p = r'\begin{{equation}}' \
+_DVIPNG_OPTIONS = ['-T', 'tight', '-z', '9', '--truecolor']
+
+# Every page of a batch is numbered (1), as it was when each equation had a document of its own
+_EQUATION = r'\setcounter{{equation}}{{0}}' \
+            r'\begin{{equation}}' \
             r'\begin{{aligned}}' \
             r'{0}' \
             r'\end{{aligned}}' \
             r'\end{{equation}}'
 
+
+def _render_batch(batch):
+    import sympy as sp
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        dvi_path = os.path.join(work_dir, 'batch.dvi')
+        sp.preview('\n'.join(tex for _, tex in batch), output='dvi', viewer='file', filename=dvi_path,
+                   euler=False, preamble=_PREAMBLE)
+
+        cmd = ['dvipng'] + _DVIPNG_OPTIONS + ['-o', os.path.join(work_dir, 'page%d.png'), dvi_path]
+        try:
+            subprocess.check_output(cmd, stderr=subprocess.STDOUT)
+        except subprocess.CalledProcessError as e:
+            raise RuntimeError(f'dvipng exited abnormally with the following output:\n{e.output}')
+
+        for i, (name, _) in enumerate(batch, 1):
+            shutil.move(os.path.join(work_dir, f'page{i}.png'), name)
+
+
+class PreviewOutput(Output):
+    def __init__(self, batch_size=50, jobs=None, deferred=False, cache=None):
+        self.batch_size = batch_size
+        self.jobs = jobs or os.cpu_count() or 1
+        self.deferred = deferred
+        self.queue = []
+
+        if cache is None:
+            try:
+                cache = ImageCache()
+            except OSError:
+                cache = False
+        self.cache = cache
+        # Queued equations are rendered by eqtex.flush() and at exit
+        register_output(self)
+
+    def process(self, func_name, cls_prefix, eq_type, tex, config):
+        base_name = f'{"_".join(cls_prefix)}_{func_name}_{eq_type.value}'
         if config.file_output_single_eq:
-            name = f'{base_name}.png'
-            sp.preview(p.format(r'\\'.join(tex)), viewer='file', euler=False, filename=name)
+            items = [(f'{base_name}.png', _EQUATION.format(r'\\'.join(tex)))]
+        else:
+            items = [(f'{base_name}_{i}.png', _EQUATION.format(t)) for i, t in enumerate(tex)]
+        self.queue.extend(items)
+
+        # Wait for enough equations to keep every job busy with a full batch
+        if not self.deferred and len(self.queue) >= self.batch_size * self.jobs:
+            self.flush()
+        return [name for name, _ in items]
+
+    def flush(self):
+        with self.lock():
+            self._flush()
+
+    def _flush(self):
+        queue, self.queue = self.queue, []
+        if not queue:
+            return
+        if not self.cache:
+            self.render(queue)
+            return
+
+        missing = {}
+        duplicates = []
+        for name, tex in queue:
+            key = self.cache.key(tex, _PREAMBLE, _DVIPNG_OPTIONS)
+            if key in missing:
+                duplicates.append((key, name))
+            elif not self.cache.fetch(key, name):
+                missing[key] = (name, tex)
+
+        self.render(list(missing.values()))
+        for key, (name, _) in missing.items():
+            self.cache.store(key, name)
+        for key, name in duplicates:
+            self.cache.fetch(key, name)
+        self.cache.evict()
+
+    def render(self, queue):
+        if not queue:
+            return
+
+        size = min(self.batch_size, -(-len(queue) // self.jobs))
+        batches = [queue[i:i + size] for i in range(0, len(queue), size)]
+        if len(batches) == 1:
+            _render_batch(batches[0])
         else:
-            for i in range(len(tex)):
-                name = f'{base_name}_{i}.png'
-                sp.preview(p.format(tex[i]), viewer='file', euler=False, filename=name)
+            with concurrent.futures.ThreadPoolExecutor(min(self.jobs, len(batches))) as executor:
+                list(executor.map(_render_batch, batches))
@@ -0,0 +1,223 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import collections
+import concurrent.futures
+import hashlib
+import json
+import os
+import socketserver
+import sys
+import threading
+
+from .build_cache import config_key, function_hash
+from .config import eqtex_config
+from .source_cache import eqtex_source_cache
+from .source_visitor import index_source, translate_function
+
+_PARSE_ERROR = -32700
+_INVALID_REQUEST = -32600
+_METHOD_NOT_FOUND = -32601
+_INVALID_PARAMS = -32602
+_INTERNAL_ERROR = -32603
+
+
+class _RpcError(Exception):
+    def __init__(self, code, message):
+        super().__init__(message)
+        self.code = code
+
+
+def _error(request_id, code, message):
+    return {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': code, 'message': message}}
+
+
+class _LRU:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+
+    def get(self, key):
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+
+class Server:
+    def __init__(self, jobs=None, max_size=256):
+        self.executor = concurrent.futures.ThreadPoolExecutor(jobs)
+        self.methods = {'functions': self.functions, 'translate': self.translate, 'stats': self.stats}
+        self._lock = threading.Lock()
+        self._sources = _LRU(max_size)
+        self._results = _LRU(max_size * 16)
+
+    def _functions(self, params):
+        if 'source' in params:
+            key = hashlib.sha1(params['source'].encode()).hexdigest()
+            with self._lock:
+                functions = self._sources.get(key)
+            if functions is None:
+                try:
+                    functions = index_source(params['source'])
+                except SyntaxError as e:
+                    raise _RpcError(_INVALID_PARAMS, f'SyntaxError: {e}')
+                with self._lock:
+                    self._sources.put(key, functions)
+            return functions
+        elif 'path' in params:
+            try:
+                # The source cache locks per file, so other paths are not blocked while this one is parsed
+                return eqtex_source_cache.functions(params['path'])
+            except (OSError, SyntaxError) as e:
+                raise _RpcError(_INVALID_PARAMS, f'{type(e).__name__}: {e}')
+        raise _RpcError(_INVALID_PARAMS, 'source or path is required')
+
+    def _config(self, options):
+        global eqtex_config
+        try:
+            return eqtex_config.snapshot().replace(**(options or {}))
+        except TypeError as e:
+            raise _RpcError(_INVALID_PARAMS, str(e))
+
+    def functions(self, params):
+        return sorted(self._functions(params))
+
+    def translate(self, params):
+        qualname = params.get('qualname')
+        nodes = self._functions(params).get(qualname)
+        if not nodes:
+            raise _RpcError(_INVALID_PARAMS, f'Function {qualname} not found')
+
+        config = self._config(params.get('options'))
+        key = (function_hash(node for _, node in nodes), config_key(config))
+        with self._lock:
+            result = self._results.get(key)
+        if result is None:
+            sym_tex, val_tex = translate_function(qualname, nodes, config)
+            result = {'sym': sym_tex, 'num': val_tex}
+            with self._lock:
+                self._results.put(key, result)
+        return result
+
+    def stats(self, params):
+        return {name: {'hits': cache.hits, 'misses': cache.misses}
+                for name, cache in [('sources', self._sources), ('results', self._results),
+                                    ('files', eqtex_source_cache)]}
+
+    def handle(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return _error(None, _PARSE_ERROR, 'Parse error')
+        if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+            return _error(None, _INVALID_REQUEST, 'Invalid request')
+
+        request_id = request.get('id')
+        method = self.methods.get(request['method'])
+        params = request.get('params', {})
+        try:
+            if method is None:
+                raise _RpcError(_METHOD_NOT_FOUND, f'Method {request["method"]} not found')
+            if not isinstance(params, dict):
+                raise _RpcError(_INVALID_PARAMS, 'params must be an object')
+            response = {'jsonrpc': '2.0', 'id': request_id, 'result': method(params)}
+        except _RpcError as e:
+            response = _error(request_id, e.code, str(e))
+        except Exception as e:
+            response = _error(request_id, _INTERNAL_ERROR, f'{type(e).__name__}: {e}')
+
+        # Requests without an id are notifications, which get no response.
+        return response if 'id' in request else None
+
+    def serve(self, reader, writer):
+        lock = threading.Lock()
+        pending = set()
+
+        def respond(future):
+            response = future.result()
+            with lock:
+                pending.discard(future)
+                if response is not None:
+                    writer.write(json.dumps(response) + '\n')
+                    writer.flush()
+
+        for line in reader:
+            if line.strip():
+                future = self.executor.submit(self.handle, line)
+                with lock:
+                    pending.add(future)
+                future.add_done_callback(respond)
+
+        with lock:
+            futures = list(pending)
+        concurrent.futures.wait(futures)
+
+    def unix_server(self, path):
+        server = self
+
+        class Handler(socketserver.BaseRequestHandler):
+            def handle(self):
+                with self.request.makefile('r', encoding='utf-8') as reader, \
+                        self.request.makefile('w', encoding='utf-8') as writer:
+                    server.serve(reader, writer)
+
+        if os.path.exists(path):
+            os.remove(path)
+        return socketserver.ThreadingUnixStreamServer(path, Handler)
+
+    def serve_unix(self, path):
+        with self.unix_server(path) as unix_server:
+            try:
+                unix_server.serve_forever()
+            finally:
+                os.remove(path)
+
+
+def _handle_cmg_args():
+    p = argparse.ArgumentParser(description='JSON-RPC server translating functions to TeX, one request per line')
+    p.add_argument('-s', '--socket', help='Listen on this Unix socket instead of stdin/stdout', type=str)
+    p.add_argument('-j', '--jobs', help='Number of worker threads (default: Python default)', type=int)
+    return p.parse_args()
+
+
+def _main():
+    cmd_args = _handle_cmg_args()
+    server = Server(cmd_args.jobs)
+    try:
+        if cmd_args.socket:
+            server.serve_unix(cmd_args.socket)
+        else:
+            server.serve(sys.stdin, sys.stdout)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    _main()
@@ -0,0 +1,111 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import ast
+import collections
+import os
+import threading
+import time
+
+from .source_visitor import FunctionIndex
+
+
+class SourceCache:
+    def __init__(self, max_size=64, lock_stripes=16):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        # Striped, so the number of locks stays bounded however many files are seen
+        self._file_locks = [threading.Lock() for _ in range(lock_stripes)]
+
+    def get(self, file_path, stats=None):
+        return self._get_entry(file_path, stats)[1]
+
+    def functions(self, file_path, stats=None):
+        return self._get_entry(file_path, stats, True)[2]
+
+    def _lookup(self, file_path, key, index):
+        entry = self._entries.get(file_path)
+        if entry and entry[0] == key and (entry[2] is not None or not index):
+            self._entries.move_to_end(file_path)
+            return entry
+        return None
+
+    def _get_entry(self, file_path, stats=None, index=False):
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        key = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._lookup(file_path, key, index)
+            if entry:
+                self.hits += 1
+        if entry:
+            if stats:
+                stats.add_file(file_path, cache_hits=1)
+            return entry
+
+        # Threads racing for the same file wait here, so it is parsed once
+        with self._file_locks[hash(file_path) % len(self._file_locks)]:
+            with self._lock:
+                entry = self._entries.get(file_path)
+                fresh = entry is not None and entry[0] == key
+                if fresh:
+                    self.hits += 1
+            if not fresh:
+                entry = self._parse(file_path, key, stats)
+            elif stats:
+                stats.add_file(file_path, cache_hits=1)
+            if index and entry[2] is None:
+                start = time.perf_counter()
+                functions = FunctionIndex()
+                functions.visit(entry[1])
+                entry[2] = functions.functions
+                if stats:
+                    stats.add_file(file_path, index=time.perf_counter() - start)
+
+        with self._lock:
+            self._entries[file_path] = entry
+            self._entries.move_to_end(file_path)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+        return entry
+
+    def _parse(self, file_path, key, stats):
+        with self._lock:
+            self.misses += 1
+        start = time.perf_counter()
+        with open(file_path) as handle:
+            source = handle.read()
+        read_time = time.perf_counter()
+        tree = ast.parse(source)
+        if stats:
+            stats.add_file(file_path, cache_misses=1, read=read_time - start, parse=time.perf_counter() - read_time,
+                           source_bytes=len(source))
+        return [key, tree, None]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+eqtex_source_cache = SourceCache()
@@ -15,37 +15,131 @@
 # You should have received a copy of the GNU Lesser Public License
 # along with EqTex. If not, see <http://www.gnu.org/licenses/>.
 
+import ast
+import collections
+import time
+
 from .func_visitor import FuncVisitor
-from .output import Output
 from .visitor import Visitor
 
 
+def _is_tag(decorator):
+    return isinstance(decorator, ast.Call) and isinstance(decorator.func, ast.Name) and decorator.func.id == 'eqtex'
+
+
+def _find_tag(func):
+    return next((t for t in func.decorator_list if _is_tag(t)), None)
+
+
+def _first_line(node):
+    return min([node.lineno] + [d.lineno for d in node.decorator_list])
+
+
+def find_function(functions, func):
+    qualname = func.__qualname__.replace('<locals>.', '')
+    candidates = functions.get(qualname, [])
+    first_line = func.__code__.co_firstlineno
+    return qualname, [(prefix, node) for prefix, node in candidates if _first_line(node) == first_line] or candidates
+
+
+class FunctionIndex(Visitor):
+    def __init__(self):
+        self.prefix = []
+        self.functions = {}
+
+    def visit_FunctionDef(self, func):
+        if _find_tag(func):
+            qualname = '.'.join(self.prefix + [func.name])
+            self.functions.setdefault(qualname, []).append((tuple(self.prefix), func))
+        else:
+            self.prefix.append(func.name)
+            for node in func.body:
+                self.visit(node)
+            self.prefix.pop()
+
+    def visit_ClassDef(self, cls):
+        self.prefix.append(cls.name)
+        for node in cls.body:
+            self.visit(node)
+        self.prefix.pop()
+
+
 class SourceVisitor(Visitor):
-    def __init__(self, target_func_qualname, output, config):
+    def __init__(self, target_func_qualname, output, config, keep_tex=False, stats=None, file_path=None):
         self.prefix = []
         self.target_func_qualname = target_func_qualname
         self.output = output
         self.config = config
+        self.keep_tex = keep_tex
+        self.stats = stats
+        self.file_path = file_path
+        self.outputs = []
+
+    def process_function(self, prefix, func):
+        self.prefix = list(prefix)
+        return self.translate(func)
+
+    def translate(self, func):
+        if self.output is None:
+            v = FuncVisitor(self.config)
+            v.visit(func)
+            return v
+
+        values = collections.Counter()
+
+        def on_equation(eq_type, tex):
+            start = time.perf_counter()
+            self.output.equation(eq_type, tex)
+            values['output'] += time.perf_counter() - start
+            values['output_bytes'] += len(tex)
+            values['equations'] += 1
 
-    def store_tex(self, visitor):
-        if self.config.sym_equation:
-            self.output.process(visitor.func_name, self.prefix, Output.EqType.SYM, visitor.sym_tex, self.config)
+        # Outputs keep the function being streamed in their state, so a shared output takes one at a time
+        lock = self.output.lock()
+        start = time.perf_counter()
+        if lock.acquire(blocking=False):
+            # The output is free, so equations are streamed to it as they are translated
+            try:
+                v = FuncVisitor(self.config, on_equation, self.keep_tex)
+                self.send(func, lambda: v.visit(func), values)
+            finally:
+                lock.release()
+            values['translate'] += time.perf_counter() - start - values['output']
+        else:
+            # Another thread streams into the output, translate meanwhile and pass the equations on once it is done
+            equations = []
+            v = FuncVisitor(self.config, lambda eq_type, tex: equations.append((eq_type, tex)), self.keep_tex)
+            v.visit(func)
+            values['translate'] += time.perf_counter() - start
+            with lock:
+                self.send(func, lambda: [on_equation(eq_type, tex) for eq_type, tex in equations], values)
+
+        if self.stats:
+            values['nodes'] += sum(1 for _ in ast.walk(func))
+            self.stats.add_function(self.file_path, '.'.join(self.prefix + [func.name]), **values)
+        return v
 
-        if self.config.val_equation:
-            self.output.process(visitor.func_name, self.prefix, Output.EqType.NUM, visitor.val_tex, self.config)
+    def send(self, func, equations, values):
+        start = time.perf_counter()
+        self.output.begin_function(func.name, self.prefix, self.config)
+        values['output'] += time.perf_counter() - start
+        try:
+            equations()
+        except BaseException:
+            self.output.abort_function()
+            raise
+        start = time.perf_counter()
+        self.outputs.extend(self.output.end_function() or [])
+        values['output'] += time.perf_counter() - start
 
     def visit_FunctionDef(self, func):
-        tag = next((t for t in func.decorator_list if t.func.id == 'eqtex'), None)
-        if tag:
+        if _find_tag(func):
             if self.target_func_qualname:
-                func_qualname = f'{".".join(self.prefix)}.{func.name}'
+                func_qualname = '.'.join(self.prefix + [func.name])
                 if func_qualname != self.target_func_qualname:
                     return
 
-            v = FuncVisitor(self.config)
-            v.visit(func)
-
-            self.store_tex(v)
+            self.translate(func)
         else:
             self.prefix.append(func.name)
             for node in func.body:
@@ -57,3 +151,17 @@ class SourceVisitor(Visitor):
         for node in cls.body:
             self.visit(node)
         self.prefix.pop()
+
+
+def index_source(source):
+    index = FunctionIndex()
+    index.visit(ast.parse(source))
+    return index.functions
+
+
+def translate_function(qualname, nodes, config):
+    visitor = SourceVisitor(qualname, None, config)
+    func_visitor = None
+    for prefix, node in nodes:
+        func_visitor = visitor.process_function(prefix, node)
+    return func_visitor.sym_tex, func_visitor.val_tex
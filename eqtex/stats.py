@@ -0,0 +1,96 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import collections
+import os
+import threading
+
+
+class Stats:
+    def __init__(self):
+        self.files = collections.defaultdict(collections.Counter)
+        self.functions = collections.defaultdict(collections.Counter)
+        self._lock = threading.RLock()
+
+    def __getstate__(self):
+        return self.files, self.functions
+
+    def __setstate__(self, state):
+        self.files, self.functions = state
+        self._lock = threading.RLock()
+
+    def add_file(self, file_path, **values):
+        file_path = os.path.abspath(file_path)
+        with self._lock:
+            self.files[file_path].update(values)
+
+    def add_function(self, file_path, qualname, **values):
+        key = (os.path.abspath(file_path), qualname)
+        with self._lock:
+            self.functions[key].update(values)
+
+    def merge(self, other):
+        with self._lock:
+            for file_path, values in other.files.items():
+                self.files[file_path].update(values)
+            for key, values in other.functions.items():
+                self.functions[key].update(values)
+
+    def reset(self):
+        with self._lock:
+            self.files.clear()
+            self.functions.clear()
+
+    def cache_hit_rate(self):
+        with self._lock:
+            hits = sum(values['cache_hits'] for values in self.files.values())
+            misses = sum(values['cache_misses'] for values in self.files.values())
+        return hits / (hits + misses) if hits + misses else None
+
+    def as_dict(self):
+        with self._lock:
+            return {
+                'files': {file_path: dict(values) for file_path, values in self.files.items()},
+                'functions': {f'{file_path}:{qualname}': dict(values)
+                              for (file_path, qualname), values in self.functions.items()},
+                'cache_hit_rate': self.cache_hit_rate(),
+            }
+
+    def report(self):
+        with self._lock:
+            return self._report()
+
+    def _report(self):
+        lines = [f'{"file":<40} {"read":>9} {"parse":>9} {"index":>9} {"hits":>5} {"misses":>6}']
+        for file_path, values in sorted(self.files.items()):
+            lines.append(f'{file_path[-40:]:<40} {values["read"] * 1e3:7.2f}ms {values["parse"] * 1e3:7.2f}ms '
+                         f'{values["index"] * 1e3:7.2f}ms {values["cache_hits"]:5} {values["cache_misses"]:6}')
+
+        lines.append('')
+        lines.append(f'{"function":<40} {"translate":>11} {"output":>9} {"nodes":>7} {"eqs":>5} {"bytes":>9}')
+        for (file_path, qualname), values in sorted(self.functions.items()):
+            lines.append(f'{qualname[-40:]:<40} {values["translate"] * 1e3:9.2f}ms {values["output"] * 1e3:7.2f}ms '
+                         f'{values["nodes"]:7} {values["equations"]:5} {values["output_bytes"]:9}')
+
+        hit_rate = self.cache_hit_rate()
+        if hit_rate is not None:
+            lines.append('')
+            lines.append(f'source cache hit rate: {hit_rate:.1%}')
+        return '\n'.join(lines)
+
+
+eqtex_stats = Stats()
@@ -15,44 +15,112 @@
 # You should have received a copy of the GNU Lesser Public License
 # along with EqTex. If not, see <http://www.gnu.org/licenses/>.
 
-import copy
-import inspect
-import ast
+import atexit
+import sys
+import weakref
 
+from .build_cache import function_hash, get_build_cache
+from .capture import capture
 from .file_output import _FileOutput
-from .source_visitor import SourceVisitor
+from .output import registered_outputs
+from .source_cache import eqtex_source_cache
+from .source_visitor import SourceVisitor, find_function
 from .config import eqtex_config
+from .stats import eqtex_stats
 
-_source = None
+_pending = {}
+# Decorator arguments of every function, so get_tex() translates it the way it was decorated
+_decorated = weakref.WeakKeyDictionary()
 
 
-def _process_func(file_path, func, **kwargs):
-    global eqtex_config
+def _process_func(file_path, func, config, keep_tex=False, **kwargs):
+    output = kwargs.pop('output') if 'output' in kwargs else _FileOutput()
+    config = config.replace(**kwargs)
+
+    stats = eqtex_stats if config.stats else None
+    func_qualname, nodes = find_function(eqtex_source_cache.functions(file_path, stats), func)
+
+    cache = None
+    if config.build_cache and output is not None:
+        cache = get_build_cache(config.build_cache, type(output).__name__)
+        func_hash = function_hash(node for _, node in nodes)
+        if cache.is_fresh(file_path, func_qualname, func_hash, config):
+            if stats:
+                stats.add_function(file_path, func_qualname, skipped=1)
+            return None
 
-    func_qualname = func.__qualname__.replace('<locals>.', '')
-    output = _FileOutput()
-    config = copy.deepcopy(eqtex_config)
+    v = SourceVisitor(func_qualname, output, config, keep_tex, stats, file_path)
+    visitor = None
+    for prefix, node in nodes:
+        visitor = v.process_function(prefix, node)
 
-    for key, val in kwargs.items():
-        if key == 'output':
-            output = val
-        else:
-            setattr(config, key, val)
+    if cache:
+        cache.update_function(file_path, func_qualname, func_hash, v.outputs, config)
 
-    with open(file_path) as handle:
-        tree = ast.parse(handle.read())
+    return visitor
 
-    v = SourceVisitor(func_qualname, output, config)
-    v.visit(tree)
+
+def _capture(file_path, func, config, **kwargs):
+    output = kwargs.pop('output') if 'output' in kwargs else _FileOutput()
+    if output is None:
+        return func
+    return capture(func, file_path, output, config.replace(**kwargs))
 
 
 def eqtex(**kwargs):
-    file_path = inspect.stack()[1].filename
+    file_path = sys._getframe(1).f_code.co_filename
 
     def decorator(func):
         global eqtex_config
-        if eqtex_config.enabled:
-            _process_func(file_path, func, **kwargs)
+        config = eqtex_config.snapshot()
+        if config.enabled:
+            _decorated[func] = (file_path, config, kwargs)
+            if kwargs.get('lazy', config.lazy):
+                _pending[func] = (file_path, config, kwargs)
+            else:
+                _process_func(file_path, func, config, **kwargs)
+
+            if kwargs.get('capture', config.capture):
+                return _capture(file_path, func, config, **kwargs)
         return func
 
     return decorator
+
+
+def flush():
+    for func in list(_pending):
+        # Another thread may flush concurrently, whoever pops the function processes it
+        pending = _pending.pop(func, None)
+        if pending:
+            file_path, config, kwargs = pending
+            _process_func(file_path, func, config, **kwargs)
+
+    for output in registered_outputs():
+        output.flush()
+
+
+def get_tex(func):
+    global eqtex_config
+    func = getattr(func, '__wrapped__', func)
+    file_path, config, kwargs = _decorated.get(func) or (func.__code__.co_filename, eqtex_config.snapshot(), {})
+    visitor = None
+    if _pending.pop(func, None):
+        visitor = _process_func(file_path, func, config, keep_tex=True, **kwargs)
+
+    if visitor is None:
+        visitor = _process_func(file_path, func, config, **dict(kwargs, output=None))
+
+    if visitor:
+        return visitor.sym_tex, visitor.val_tex
+    return None
+
+
+def _exit():
+    # A single hook, since atexit runs handlers in reverse order and outputs are created after this module
+    flush()
+    for output in registered_outputs():
+        output.close()
+
+
+eqtex.flush = flush
+atexit.register(_exit)
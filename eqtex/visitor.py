@@ -19,16 +19,28 @@ import ast
 
 
 class Visitor(ast.NodeVisitor):
+    _handlers = {}
+    _node_handlers = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._handlers = {name[len('process_'):]: getattr(cls, name) for name in dir(cls)
+                         if name.startswith('process_')}
+        cls._node_handlers = {}
+
     def process(self, node, *args, func_suffix=None, ignore_missing=True):
         if func_suffix:
-            name = f'process_{func_suffix}'
+            method = self._handlers.get(func_suffix)
         else:
-            name = f'process_{node.__class__.__name__}'
+            try:
+                method = self._node_handlers[node.__class__]
+            except KeyError:
+                func_suffix = node.__class__.__name__
+                method = self._node_handlers[node.__class__] = self._handlers.get(func_suffix)
 
-        method = getattr(self, name, None)
         if method:
-            return method(node, *args)
+            return method(self, node, *args)
         elif ignore_missing:
-            return None, None
+            return None
         else:
-            raise RuntimeError(f'{name}() not found!')
+            raise RuntimeError(f'process_{func_suffix or node.__class__.__name__}() not found!')
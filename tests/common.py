@@ -26,6 +26,26 @@ class Buffer(Output):
             self.num = tex
 
 
+class Stream(Output):
+    def __init__(self):
+        self.calls = []
+
+    def process(self, func_name, cls_prefix, eq_type, tex, config):
+        raise AssertionError('process() called')
+
+    def begin_function(self, func_name, cls_prefix, config):
+        self.calls.append(('begin', list(cls_prefix), func_name))
+
+    def equation(self, eq_type, tex):
+        self.calls.append((eq_type.value, tex))
+
+    def end_function(self):
+        self.calls.append(('end',))
+
+    def abort_function(self):
+        self.calls.append(('abort',))
+
+
 class TestBase:
     def setup_method(self):
         global eqtex_config
@@ -0,0 +1,125 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import asyncio
+import os
+import shutil
+import stat
+
+import pytest
+
+from common import *
+from eqtex import *
+from eqtex.aio import AsyncRenderer
+from eqtex.image_cache import ImageCache
+
+SOURCE = ('class A:\n'
+          '    @eqtex()\n'
+          '    def func(self, x):\n'
+          '        a = x + 1\n'
+          '        b = a * 2\n')
+
+# Stand-ins for the TeX toolchain, latex logs its runs to $EQTEX_RUNS
+LATEX = ('#!/bin/sh\n'
+         'for a; do f=$a; done\n'
+         'echo latex >> "$EQTEX_RUNS"\n'
+         'sleep 0.1\n'
+         'grep -q fail "$f" && exit 1\n'
+         'cp "$f" "${f%.tex}.dvi"\n')
+
+DVIPNG = ('#!/bin/sh\n'
+          'while [ "$1" != "-o" ]; do shift; done\n'
+          'cp "$3" "$(printf "$2" 1)"\n')
+
+
+def _run(coroutine):
+    return asyncio.get_event_loop().run_until_complete(coroutine)
+
+
+class TestAio(TestBase):
+    def setup_method(self):
+        super().setup_method()
+        shutil.rmtree('aio', ignore_errors=True)
+        os.makedirs('aio/bin')
+        for name, script in [('latex', LATEX), ('dvipng', DVIPNG)]:
+            path = f'aio/bin/{name}'
+            with open(path, 'w') as f:
+                f.write(script)
+            os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+        self.environ = dict(os.environ)
+        os.environ['PATH'] = f'{os.path.abspath("aio/bin")}{os.pathsep}{os.environ["PATH"]}'
+        os.environ['EQTEX_RUNS'] = os.path.abspath('aio/runs.log')
+
+    def teardown_method(self):
+        super().teardown_method()
+        os.environ.clear()
+        os.environ.update(self.environ)
+        shutil.rmtree('aio', ignore_errors=True)
+
+    def runs(self):
+        if not os.path.exists('aio/runs.log'):
+            return 0
+        with open('aio/runs.log') as f:
+            return len(f.readlines())
+
+    def test_translate(self):
+        @eqtex(output=self.buffer)
+        def func(x):
+            a = x * 3
+
+        renderer = AsyncRenderer(cache=False)
+        assert _run(renderer.translate(func)) == ([r'a=x \cdot 3'], [r'a=x \cdot 3'])
+        assert _run(renderer.translate(source=SOURCE, qualname='A.func', val_equation=False)) == \
+            (['a=x + 1', r'b=a \cdot 2'], [])
+
+        with pytest.raises(RuntimeError):
+            _run(renderer.translate(source=SOURCE, qualname='B.func'))
+
+    def test_render_function(self):
+        renderer = AsyncRenderer(cache=False)
+        names = _run(renderer.render_function(source=SOURCE, qualname='A.func', directory='aio'))
+        assert names == ['aio/A_func_sym.png', 'aio/A_func_num.png']
+
+        with open('aio/A_func_num.png') as f:
+            assert r'a=x + 1\\b=x + 1 \cdot 2' in f.read()
+
+    def test_concurrency_limit(self):
+        renderer = AsyncRenderer(max_processes=2, cache=False)
+
+        async def render_all():
+            loop = asyncio.get_event_loop()
+            start = loop.time()
+            await asyncio.gather(*(renderer.render([f'a={i}'], f'aio/{i}.png') for i in range(4)))
+            return loop.time() - start
+
+        # Two runs at a time, each taking at least 0.1s
+        assert _run(render_all()) >= 0.2
+        assert self.runs() == 4
+
+    def test_cache(self):
+        renderer = AsyncRenderer(cache=ImageCache('aio/cache'))
+        _run(renderer.render(['a=1'], 'aio/a.png'))
+        _run(renderer.render(['a=1'], 'aio/b.png'))
+        assert self.runs() == 1
+        assert renderer.cache.hits == 1
+        assert os.path.exists('aio/b.png')
+
+    def test_error(self):
+        renderer = AsyncRenderer(cache=False)
+        with pytest.raises(RuntimeError, match='latex exited abnormally'):
+            _run(renderer.render(['fail'], 'aio/fail.png'))
+        assert not os.path.exists('aio/fail.png')
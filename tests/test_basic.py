@@ -44,6 +44,19 @@ class TestFuncs(TestBase):
         assert self.buffer.sym == []
         assert self.buffer.num == []
 
+    def test_redefined(self):
+        @eqtex(output=self.buffer)
+        def func():
+            a = 1
+
+        assert self.buffer.sym == ['a=1']
+
+        @eqtex(output=self.buffer)
+        def func():
+            b = 2
+
+        assert self.buffer.sym == ['b=2']
+
 
 class TestAssign(TestBase):
     def test1(self):
@@ -135,3 +148,42 @@ class TestOperatorPrecedence(TestBase):
 
         assert self.buffer.sym == [r'a=\left(1 + \frac{\frac{2 + 3}{4}}{5}\right) \cdot 6']
         assert self.buffer.num == [r'a=\left(1 + \frac{\frac{2 + 3}{4}}{5}\right) \cdot 6']
+
+    def test_3(self):
+        @eqtex(output=self.buffer)
+        def func():
+            a = 2 * (1 + 3)
+
+        assert self.buffer.sym == [r'a=2 \cdot \left(1 + 3\right)']
+        assert self.buffer.num == [r'a=2 \cdot \left(1 + 3\right)']
+
+
+class TestSharedValues(TestBase):
+    def test_shared_rendering(self):
+        @eqtex(output=self.buffer)
+        def func(x):
+            A = array([[1, 2], [3, 4]])
+            b = x + A
+
+        sym, num = get_tex(func)
+        assert sym[0] is num[0]
+        assert sym[1] is not num[1]
+
+    def test_chain(self):
+        @eqtex(output=self.buffer)
+        def func(x):
+            a = x + x
+            b = a + a
+            c = b + b
+
+        assert self.buffer.sym == ['a=x + x', 'b=a + a', 'c=b + b']
+        assert self.buffer.num == ['a=x + x', 'b=x + x + x + x', 'c=x + x + x + x + x + x + x + x']
+
+    def test_unknown_call(self):
+        @eqtex(output=self.buffer)
+        def func(x):
+            a = unknown(x)
+            b = a
+
+        assert self.buffer.sym == ['a=None', 'b=a']
+        assert self.buffer.num == ['a=None', 'b=None']
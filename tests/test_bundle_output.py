@@ -0,0 +1,106 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import gc
+import os
+import sqlite3
+
+import pytest
+
+from common import *
+from eqtex import *
+from eqtex.output import registered_outputs
+from eqtex.tag import _exit
+
+
+class TestBundleOutput(TestBase):
+    def setup_method(self):
+        super().setup_method()
+        os.system('rm test_bundle.* -f')
+
+    def teardown_method(self):
+        super().teardown_method()
+        os.system('rm test_bundle.* -f')
+
+    def test_fetch(self):
+        bundle = BundleOutput('test_bundle.db', batch_size=1)
+
+        class TestClass:
+            @eqtex(output=bundle)
+            def func(self, x):
+                a = x
+                b = a + 1
+
+        qualname = 'TestBundleOutput.test_fetch.TestClass.func'
+        assert bundle.fetch(qualname) == r'a=x\\b=a + 1'
+        assert bundle.fetch(qualname, Output.EqType.NUM, 1) == 'b=x + 1'
+        assert bundle.fetch(qualname, Output.EqType.NUM, 2) is None
+        assert bundle.fetch('TestClass.func') is None
+        bundle.close()
+
+    def test_write_tex(self):
+        bundle = BundleOutput('test_bundle.db', 'test_bundle.tex')
+
+        @eqtex(output=bundle)
+        def func():
+            a = 1
+            b = 2
+
+        eqtex(output=bundle)(func)
+        bundle.close()
+
+        with open('test_bundle.tex', 'r') as f:
+            lines = f.read().splitlines()
+
+        prefix = 'TestBundleOutput.test_write_tex.func'
+        assert lines == [r'\providecommand{\eqtex}[2]{\csname eqtex@#1@#2\endcsname}',
+                         rf'\expandafter\def\csname eqtex@{prefix}@num@0\endcsname{{a=1}}',
+                         rf'\expandafter\def\csname eqtex@{prefix}@num@1\endcsname{{b=2}}',
+                         rf'\expandafter\def\csname eqtex@{prefix}@num\endcsname{{a=1\\b=2}}',
+                         rf'\expandafter\def\csname eqtex@{prefix}@sym@0\endcsname{{a=1}}',
+                         rf'\expandafter\def\csname eqtex@{prefix}@sym@1\endcsname{{b=2}}',
+                         rf'\expandafter\def\csname eqtex@{prefix}@sym\endcsname{{a=1\\b=2}}']
+
+    def test_exit(self):
+        global eqtex_config
+        eqtex_config.lazy = True
+        bundle = BundleOutput('test_bundle.db', 'test_bundle.tex')
+
+        @eqtex(output=bundle)
+        def func():
+            a = 1
+
+        _exit()
+        connection = sqlite3.connect('test_bundle.db')
+        assert connection.execute('SELECT tex FROM equations').fetchall() == [('a=1',), ('a=1',)]
+        connection.close()
+        assert os.path.exists('test_bundle.tex')
+
+        with pytest.raises(RuntimeError):
+            eqtex(output=bundle, lazy=False)(func)
+
+    def test_registry(self):
+        bundle = BundleOutput('test_bundle.db')
+        assert bundle in registered_outputs()
+        bundle.close()
+        assert bundle not in registered_outputs()
+
+        bundle = BundleOutput('test_bundle.db')
+        count = len(registered_outputs())
+        del bundle
+        gc.collect()
+        assert len(registered_outputs()) == count - 1
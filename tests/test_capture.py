@@ -0,0 +1,136 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+
+import numpy
+
+from common import *
+from eqtex import *
+from eqtex.capture import _trace_call
+
+
+class RunBuffer(Output):
+    def __init__(self):
+        self.run = []
+
+    def process(self, func_name, cls_prefix, eq_type, tex, config):
+        if eq_type == Output.EqType.RUN:
+            self.run.append(tex)
+
+
+class TestCapture(TestBase):
+    def setup_method(self):
+        super().setup_method()
+        self.buffer = RunBuffer()
+
+    def test_disabled(self):
+        def func(x):
+            a = x
+
+        assert eqtex(output=self.buffer)(func) is func
+
+    def test_scalars(self):
+        @eqtex(output=self.buffer, capture=True)
+        def func(x, y):
+            a = x + 1
+            b = a * y
+            c = b / 3
+            return c
+
+        assert func(2, -2.5) == -2.5
+        assert self.buffer.run == [['a=2 + 1=3', r'b=3 \cdot \left(-2.5\right)=-7.5',
+                                    r'c=\frac{\left(-7.5\right)}{3}=-2.5']]
+        assert get_tex(func) == (['a=x + 1', r'b=a \cdot y', r'c=\frac{b}{3}'],
+                                 ['a=x + 1', r'b=x + 1 \cdot y', r'c=\frac{x + 1 \cdot y}{3}'])
+
+    def test_chain_tracer(self):
+        events = []
+
+        def tracer(frame, event, arg):
+            events.append((frame.f_code.co_name, event))
+            return tracer
+
+        @eqtex(output=self.buffer, capture=True)
+        def func(x):
+            a = x + 1
+            return abs(a)
+
+        previous = sys.gettrace()
+        sys.settrace(tracer)
+        try:
+            func(2)
+            assert sys.gettrace() is tracer
+        finally:
+            sys.settrace(previous)
+
+        assert ('func', 'call') in events
+        assert events.count(('func', 'line')) == 2
+        assert ('func', 'return') in events
+        assert self.buffer.run == [['a=2 + 1=3']]
+
+    def test_loop_snapshots(self):
+        def func(n):
+            a = 0
+            for i in range(n):
+                a = a + i
+            return a
+
+        line = func.__code__.co_firstlineno
+        result, snapshots = _trace_call(func, (100000,), {})
+        assert result == 4999950000
+        assert sorted(snapshots) == [line + 1, line + 2, line + 3, line + 4]
+        assert snapshots[line + 3] == ({'n': 100000, 'a': 0, 'i': 0}, {'n': 100000, 'a': 0, 'i': 0})
+        assert snapshots[line + 4][1]['a'] == 4999950000
+
+    def test_float_format(self):
+        global eqtex_config
+        eqtex_config.capture_precision = 3
+
+        @eqtex(output=self.buffer, capture=True)
+        def func(x):
+            a = x * 1000000
+
+        func(0.123456)
+        assert self.buffer.run == [[r'a=0.123 \cdot 1000000=1.23 \cdot 10^{5}']]
+
+    def test_sampling(self):
+        @eqtex(output=self.buffer, capture=True, capture_max=2)
+        def func(x):
+            a = x
+
+        @eqtex(output=self.buffer, capture=True, capture_rate=0)
+        def func2(x):
+            a = x
+
+        for i in range(5):
+            func(i)
+            func2(i)
+        assert self.buffer.run == [['a=0'], ['a=1']]
+
+    def test_numpy(self):
+        @eqtex(output=self.buffer, capture=True)
+        def func(x, y):
+            a = x * 2
+            b = y + 1
+
+        func(numpy.array([[1, 2], [3, 4]]), numpy.zeros((30, 30)))
+        assert self.buffer.run == [[r'a=\begin{bmatrix}1&2\\3&4\end{bmatrix} \cdot 2='
+                                    r'\begin{bmatrix}2&4\\6&8\end{bmatrix}',
+                                    r'b=\begin{bmatrix}0&\cdots&0\\\vdots&\ddots&\vdots\\0&\cdots&0\end{bmatrix}'
+                                    r'_{30 \times 30} + 1=\begin{bmatrix}1&\cdots&1\\\vdots&\ddots&\vdots\\1&\cdots&1'
+                                    r'\end{bmatrix}_{30 \times 30}']]
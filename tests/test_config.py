@@ -15,6 +15,11 @@
 # You should have received a copy of the GNU Lesser Public License
 # along with EqTex. If not, see <http://www.gnu.org/licenses/>.
 
+import copy
+import os
+
+import pytest
+
 from common import *
 from eqtex import *
 
@@ -53,6 +58,17 @@ class TestGlobalConfig(TestBase):
         assert hasattr(self.buffer, 'sym')
         assert not hasattr(self.buffer, 'num')
 
+    def test_disable_num_rendering(self):
+        global eqtex_config
+        eqtex_config.val_equation = False
+
+        @eqtex(output=self.buffer)
+        def func(x):
+            a = x
+            b = a
+
+        assert get_tex(func) == (['a=x', 'b=a'], [])
+
     def test_disable_skip_self(self):
         global eqtex_config
         eqtex_config.skip_self = False
@@ -84,3 +100,137 @@ class TestGlobalConfig(TestBase):
 
         assert self.buffer.sym == ['b=a + 2']
         assert self.buffer.num == ['b=a + 2']
+
+    def test_lazy(self):
+        global eqtex_config
+        eqtex_config.lazy = True
+
+        @eqtex(output=self.buffer)
+        def func():
+            a = 1
+
+        assert not hasattr(self.buffer, 'sym')
+
+        eqtex.flush()
+        assert self.buffer.sym == ['a=1']
+        assert self.buffer.num == ['a=1']
+
+    def test_lazy_snapshot(self):
+        global eqtex_config
+        eqtex_config.lazy = True
+
+        @eqtex(output=self.buffer)
+        def func():
+            a = 1
+
+        eqtex_config.sym_equation = False
+        eqtex.flush()
+        assert self.buffer.sym == ['a=1']
+
+    def test_lazy_get_tex(self):
+        global eqtex_config
+        eqtex_config.lazy = True
+
+        @eqtex(output=self.buffer)
+        def func():
+            a = 1
+            b = a
+
+        assert not hasattr(self.buffer, 'sym')
+        assert get_tex(func) == (['a=1', 'b=a'], ['a=1', 'b=1'])
+        assert self.buffer.sym == ['a=1', 'b=a']
+
+        del self.buffer.sym
+        flush()
+        assert not hasattr(self.buffer, 'sym')
+
+    def test_get_tex_overrides(self):
+        @eqtex(output=self.buffer, sym_equation=False, lazy=True)
+        def func1(x):
+            a = x + 1
+
+        assert get_tex(func1) == ([], ['a=x + 1'])
+        assert get_tex(func1) == ([], ['a=x + 1'])
+
+        @eqtex(output=self.buffer, val_equation=False)
+        def func2(x):
+            a = x + 1
+
+        assert get_tex(func2) == (['a=x + 1'], [])
+
+    def test_val_expand_limit(self):
+        global eqtex_config
+        eqtex_config.val_expand_limit = 10
+
+        @eqtex(output=self.buffer)
+        def func(x):
+            a = x + x
+            b = a + a
+            c = b + b
+
+        assert self.buffer.sym == ['a=x + x', 'b=a + a', 'c=b + b']
+        assert self.buffer.num == ['a=x + x', 'b=x + x + x + x', 'c=b + b']
+
+    def test_stats(self):
+        global eqtex_config
+        eqtex_config.stats = True
+        eqtex_stats.reset()
+
+        @eqtex(output=self.buffer)
+        def func(x):
+            a = x + 1
+
+        eqtex_config.stats = False
+
+        @eqtex(output=self.buffer)
+        def func2(x):
+            b = x
+
+        values = eqtex_stats.functions[(os.path.abspath(__file__), 'TestGlobalConfig.test_stats.func')]
+        assert values['equations'] == 2
+        assert values['output_bytes'] == 2 * len('a=x + 1')
+        assert values['nodes'] > 0
+        assert len(eqtex_stats.functions) == 1
+        assert eqtex_stats.cache_hit_rate() is not None
+        eqtex_stats.reset()
+
+
+class TestConfig(TestBase):
+    def test_snapshot(self):
+        global eqtex_config
+        config = eqtex_config.snapshot()
+        assert eqtex_config.snapshot() is config
+
+        eqtex_config.val_equation = False
+        assert config.val_equation
+        assert not eqtex_config.val_equation
+        assert eqtex_config.snapshot() == config.replace(val_equation=False)
+
+        eqtex_config.reset()
+        assert eqtex_config.snapshot() is config
+
+    def test_copy_global(self):
+        global eqtex_config
+        eqtex_config.lazy = True
+        for copied in [copy.copy(eqtex_config), copy.deepcopy(eqtex_config)]:
+            assert copied.lazy
+            copied.lazy = False
+            assert eqtex_config.lazy
+            assert copied.snapshot() == eqtex_config.snapshot().replace(lazy=False)
+
+    def test_immutable(self):
+        config = eqtex_config.snapshot()
+        with pytest.raises(AttributeError):
+            config.lazy = True
+        with pytest.raises(TypeError):
+            config.replace(unknown=1)
+
+    def test_replace(self):
+        config = eqtex_config.snapshot()
+        assert config.replace() is config
+        assert config.replace(lazy=False) is config
+
+        other = config.replace(max_matrix_size=5)
+        assert other.max_matrix_size == 5
+        assert config.max_matrix_size == 20
+        assert {config: 1, other: 2}[config.replace(max_matrix_size=5)] == 2
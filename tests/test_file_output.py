@@ -16,17 +16,28 @@
 # along with EqTex. If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import threading
+import time
+
+import pytest
 
 from common import *
 from eqtex import *
+from eqtex.build_cache import get_build_cache
+from eqtex.file_output import _FileOutput
 
 
 class TestFileOutput(TestBase):
     def setup_method(self):
-        os.system('rm *tex -f')
+        super().setup_method()
+        os.system('rm *tex test_cache.json -f')
 
     def teardown_method(self):
-        os.system('rm *tex -f')
+        super().teardown_method()
+        cache = get_build_cache('test_cache.json', _FileOutput.__name__)
+        cache.files.clear()
+        cache.modified = False
+        os.system('rm *tex test_cache.json -f')
 
     def test_enable_single_eq(self):
         global eqtex_config
@@ -69,3 +80,112 @@ class TestFileOutput(TestBase):
         assert os.path.exists('TestFileOutput_test_disable_single_eq_func_num_1.tex')
         with open('TestFileOutput_test_disable_single_eq_func_num_1.tex', 'r') as f:
             assert f.read() == r'b=2'
+
+    def test_build_cache(self):
+        global eqtex_config
+        eqtex_config.build_cache = 'test_cache.json'
+
+        @eqtex()
+        def func():
+            a = 1
+
+        name = 'TestFileOutput_test_build_cache_func_sym.tex'
+        with open(name, 'w') as f:
+            f.write('unchanged')
+
+        eqtex()(func)
+        with open(name, 'r') as f:
+            assert f.read() == 'unchanged'
+
+        os.remove(name)
+        eqtex()(func)
+        with open(name, 'r') as f:
+            assert f.read() == 'a=1'
+
+    def test_build_cache_without_files(self):
+        global eqtex_config
+        eqtex_config.build_cache = 'test_cache.json'
+
+        class Recorder(Output):
+            def __init__(self):
+                self.tex = []
+
+            def process(self, func_name, cls_prefix, eq_type, tex, config):
+                self.tex.append(tex)
+
+        for _ in range(2):
+            output = Recorder()
+
+            @eqtex(output=output)
+            def func(x):
+                a = x + 1
+
+            assert output.tex == [['a=x + 1'], ['a=x + 1']]
+
+        get_build_cache('test_cache.json', Recorder.__name__).modified = False
+
+    def test_skip_unchanged(self):
+        output = _FileOutput()
+        output.write('unchanged.tex', 'a=1')
+        mtime = os.stat('unchanged.tex').st_mtime_ns
+        output.write('unchanged.tex', 'a=1')
+        assert os.stat('unchanged.tex').st_mtime_ns == mtime
+        output.write('unchanged.tex', 'a=2')
+
+        assert output.written == 2
+        assert output.skipped == 1
+        assert [f for f in os.listdir('.') if f.endswith('.tmp')] == []
+        with open('unchanged.tex', 'r') as f:
+            assert f.read() == 'a=2'
+
+    def test_abort(self):
+        with pytest.raises(RuntimeError):
+            @eqtex()
+            def func(foo):
+                a = 1
+                b = foo.bar
+
+        assert [f for f in os.listdir('.') if f.endswith('.tmp') or f.endswith('.tex')] == []
+
+
+class TestStreamingOutput(TestBase):
+    def test_callbacks(self):
+        stream = Stream()
+
+        @eqtex(output=stream)
+        def func(x):
+            a = x
+            b = a
+
+        assert stream.calls == [('begin', ['TestStreamingOutput', 'test_callbacks'], 'func'), ('sym', 'a=x'),
+                                ('num', 'a=x'), ('sym', 'b=a'), ('num', 'b=x'), ('end',)]
+
+    def test_stream_before_error(self):
+        stream = Stream()
+        with pytest.raises(RuntimeError):
+            @eqtex(output=stream)
+            def func(foo):
+                a = 1
+                b = foo.bar
+
+        assert stream.calls == [('begin', ['TestStreamingOutput', 'test_stream_before_error'], 'func'),
+                                ('sym', 'a=1'), ('num', 'a=1'), ('abort',)]
+
+    def test_shared(self):
+        stream = Stream()
+
+        def decorate():
+            @eqtex(output=stream)
+            def func(x):
+                a = x
+
+        with stream.lock():
+            thread = threading.Thread(target=decorate)
+            thread.start()
+            time.sleep(0.1)
+            assert thread.is_alive()
+            assert stream.calls == []
+        thread.join()
+
+        assert stream.calls == [('begin', ['TestStreamingOutput', 'test_shared', 'decorate'], 'func'),
+                                ('sym', 'a=x'), ('num', 'a=x'), ('end',)]
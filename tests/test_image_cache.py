@@ -0,0 +1,83 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import shutil
+
+from eqtex.image_cache import ImageCache
+
+
+class TestImageCache:
+    def setup_method(self):
+        shutil.rmtree('image_cache', ignore_errors=True)
+        os.system('rm *png -f')
+
+    def teardown_method(self):
+        shutil.rmtree('image_cache', ignore_errors=True)
+        os.system('rm *png -f')
+
+    def write(self, name, data):
+        with open(name, 'w') as f:
+            f.write(data)
+
+    def test_fetch_stored(self):
+        cache = ImageCache('image_cache')
+        key = cache.key('a=1', 'preamble')
+        assert key != cache.key('a=1', 'other preamble')
+        assert not cache.fetch(key, 'a.png')
+
+        self.write('a.png', 'image')
+        cache.store(key, 'a.png')
+        assert cache.fetch(key, 'b.png')
+        with open('b.png', 'r') as f:
+            assert f.read() == 'image'
+        assert (cache.hits, cache.misses) == (1, 1)
+
+    def test_lru_eviction(self):
+        cache = ImageCache('image_cache', max_size=10)
+        for i, name in enumerate(['a', 'b', 'c']):
+            self.write(f'{name}.png', '12345')
+            cache.store(name, f'{name}.png')
+            os.utime(os.path.join('image_cache', f'{name}.png'), (i, i))
+
+        cache.fetch('a', 'a.png')
+        cache.evict()
+        assert sorted(os.listdir('image_cache')) == ['a.png', 'c.png']
+
+    def test_evict_threshold(self):
+        cache = ImageCache('image_cache', max_size=10)
+        self.write('a.png', '12345')
+        cache.store('a', 'a.png')
+        cache.evict()
+        assert cache.size == 5
+
+        self.write(os.path.join('image_cache', 'b.png'), '12345')
+        os.utime(os.path.join('image_cache', 'b.png'), (0, 0))
+        cache.evict()
+        assert sorted(os.listdir('image_cache')) == ['a.png', 'b.png']
+
+        self.write('c.png', '12345')
+        cache.store('c', 'c.png')
+        assert cache.size == 10
+        cache.store('a', 'a.png')
+        assert cache.size == 10
+
+        self.write('d.png', '12345')
+        cache.store('d', 'd.png')
+        cache.evict()
+        assert sorted(os.listdir('image_cache')) == ['c.png', 'd.png']
+        assert cache.size == 10
@@ -0,0 +1,48 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import subprocess
+import sys
+
+import eqtex
+
+# Generous enough for slow CI machines; importing sympy alone takes several times longer
+IMPORT_BUDGET = 0.3
+
+SCRIPT = ('import sys, time\n'
+          'start = time.perf_counter()\n'
+          'import eqtex\n'
+          'print(time.perf_counter() - start, "sympy" in sys.modules, "numpy" in sys.modules)\n')
+
+
+def _import_eqtex():
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.dirname(os.path.abspath(eqtex.__file__))))
+    output = subprocess.check_output([sys.executable, '-c', SCRIPT], env=env, universal_newlines=True)
+    duration, sympy, numpy = output.split()
+    return float(duration), sympy == 'True', numpy == 'True'
+
+
+class TestImport:
+    def test_no_heavy_dependencies(self):
+        _, sympy, numpy = _import_eqtex()
+        assert not sympy
+        assert not numpy
+
+    def test_import_budget(self):
+        duration = min(_import_eqtex()[0] for _ in range(3))
+        assert duration < IMPORT_BUDGET, f'import eqtex took {duration:.3f}s (budget {IMPORT_BUDGET}s)'
@@ -0,0 +1,189 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import argparse
+import os
+import shutil
+import time
+
+from common import *
+from eqtex import *
+from eqtex.build_cache import BuildCache
+from eqtex.main import _file_states, _find_file_paths, _poll, _process_file, _process_files
+
+SOURCE = ('from eqtex import eqtex\n'
+          '\n'
+          'class {0}:\n'
+          '    @eqtex()\n'
+          '    def func(self):\n'
+          '        a = {1}\n')
+
+
+class TestMain(TestBase):
+    def setup_method(self):
+        super().setup_method()
+        os.system('rm *tex test_cache.json -f')
+        shutil.rmtree('src', ignore_errors=True)
+        os.makedirs('src/pkg/sub')
+        os.makedirs('src/build')
+        for path, cls, val in [('src/a.py', 'A', 1), ('src/pkg/b.py', 'B', 2), ('src/pkg/sub/c.py', 'C', 3),
+                               ('src/pkg/test_b.py', 'TestB', 4), ('src/build/d.py', 'D', 5)]:
+            with open(path, 'w') as f:
+                f.write(SOURCE.format(cls, val))
+        with open('src/notes.txt', 'w') as f:
+            f.write('a = 1\n')
+
+    def teardown_method(self):
+        super().teardown_method()
+        os.system('rm *tex test_cache.json -f')
+        shutil.rmtree('src', ignore_errors=True)
+
+    def args(self, sources, include=(), exclude=()):
+        return argparse.Namespace(sources=sources, include=list(include), exclude=list(exclude), jobs=1)
+
+    def test_single_file(self):
+        assert _find_file_paths(self.args('src/a.py')) == ['src/a.py']
+
+    def test_directory(self):
+        assert _find_file_paths(self.args('src')) == ['src/a.py', 'src/build/d.py', 'src/pkg/b.py',
+                                                      'src/pkg/sub/c.py', 'src/pkg/test_b.py']
+
+    def test_include_exclude(self):
+        args = self.args('src', include=['*/pkg/*'], exclude=['test_*.py', 'src/pkg/sub'])
+        assert _find_file_paths(args) == ['src/pkg/b.py']
+
+    def test_parallel(self):
+        paths = _find_file_paths(self.args('src'))
+        _process_files(paths, jobs=2)
+
+        for cls, val in [('A', 1), ('B', 2), ('C', 3), ('TestB', 4), ('D', 5)]:
+            with open(f'{cls}_func_sym.tex', 'r') as f:
+                assert f.read() == f'a={val}'
+
+    def test_streaming(self):
+        stream = Stream()
+        _process_files(['src/a.py', 'src/pkg/b.py'], jobs=2, output=stream)
+        assert stream.calls == [('begin', ['A'], 'func'), ('sym', 'a=1'), ('num', 'a=1'), ('end',),
+                                ('begin', ['B'], 'func'), ('sym', 'a=2'), ('num', 'a=2'), ('end',)]
+
+    def test_stats(self):
+        global eqtex_config
+        eqtex_config.stats = True
+        eqtex_stats.reset()
+
+        class Slow(Output):
+            def process(self, func_name, cls_prefix, eq_type, tex, config):
+                time.sleep(0.1)
+                return []
+
+        key = (os.path.abspath('src/a.py'), 'A.func')
+        _, stats = _process_file('src/a.py', eqtex_config.snapshot())
+        assert 'output' not in stats.functions[key]
+
+        _process_files(['src/a.py'], output=Slow())
+        values = eqtex_stats.functions[key]
+        eqtex_stats.reset()
+        assert 0.2 <= values['output'] < 0.4
+        assert values['translate'] < 0.2
+
+    def test_other_decorators_and_broken_files(self):
+        with open('src/pkg/e.py', 'w') as f:
+            f.write('import functools\n'
+                    'from eqtex import eqtex\n'
+                    '\n'
+                    'class E:\n'
+                    '    @property\n'
+                    '    def prop(self):\n'
+                    '        return 1\n'
+                    '\n'
+                    '    @staticmethod\n'
+                    '    @functools.lru_cache()\n'
+                    '    @eqtex()\n'
+                    '    def func():\n'
+                    '        a = 6\n')
+        with open('src/pkg/broken.py', 'w') as f:
+            f.write('def func(:\n')
+
+        _process_files(_find_file_paths(self.args('src')))
+
+        for cls, val in [('A', 1), ('B', 2), ('C', 3), ('E', 6)]:
+            with open(f'{cls}_func_sym.tex', 'r') as f:
+                assert f.read() == f'a={val}'
+
+    def test_build_cache(self):
+        paths = _find_file_paths(self.args('src'))
+        cache = BuildCache('test_cache.json')
+        _process_files(paths, cache=cache)
+        assert cache.skipped == 0
+
+        os.remove('A_func_sym.tex')
+        with open('src/pkg/b.py', 'w') as f:
+            f.write(SOURCE.format('B', 7))
+
+        cache = BuildCache('test_cache.json')
+        _process_files(paths, cache=cache)
+        assert cache.skipped == 3
+        with open('A_func_sym.tex', 'r') as f:
+            assert f.read() == 'a=1'
+        with open('B_func_sym.tex', 'r') as f:
+            assert f.read() == 'a=7'
+
+        cache = BuildCache('test_cache.json')
+        _process_files(paths, cache=cache)
+        assert cache.skipped == 5
+
+    def write(self, path, source, mtime):
+        with open(path, 'w') as f:
+            f.write(source)
+        os.utime(path, ns=(mtime, mtime))
+
+    def test_watch(self):
+        args = self.args('src')
+        paths = _find_file_paths(args)
+        states = _file_states(paths)
+        output = _process_files(paths)
+        assert _poll(args, states, None, output) == []
+
+        self.write('src/pkg/b.py', SOURCE.format('B', 7) + '\n    @eqtex()\n    def func2(self):\n        b = 1\n', 1)
+        assert _poll(args, states, None, output) == ['B.func', 'B.func2']
+        with open('B_func_sym.tex', 'r') as f:
+            assert f.read() == 'a=7'
+
+        self.write('src/pkg/b.py', SOURCE.format('B', 7) + '\n    @eqtex()\n    def func2(self)\n', 2)
+        assert _poll(args, states, None, output) == []
+
+        self.write('src/pkg/b.py', SOURCE.format('B', 7) + '\n    @eqtex()\n    def func2(self):\n        b = 2\n', 3)
+        assert _poll(args, states, None, output) == ['B.func2']
+        with open('B_func2_sym.tex', 'r') as f:
+            assert f.read() == 'b=2'
+
+        os.remove('src/a.py')
+        assert _poll(args, states, None, output) == []
+        assert 'src/a.py' not in states
+
+    def test_watch_broken_file(self):
+        self.write('src/broken.py', 'def func(:\n', 1)
+        args = self.args('src')
+        paths = _find_file_paths(args)
+        states = _file_states(paths)
+        assert states['src/broken.py'][1] == {}
+        output = _process_files(paths)
+
+        self.write('src/broken.py', SOURCE.format('F', 8), 2)
+        assert _poll(args, states, None, output) == ['F.func']
+        with open('F_func_sym.tex', 'r') as f:
+            assert f.read() == 'a=8'
@@ -59,6 +59,25 @@ class TestNumpy(TestBase):
         assert self.buffer.num == [
             r'A=\begin{bmatrix}1&0&0&0&0\\0&1&0&0&0\\0&0&1&0&0\\0&0&0&1&0\\0&0&0&0&1\end{bmatrix}_{5}']
 
+    def test_eye_elided(self):
+        @eqtex(output=self.buffer)
+        def func():
+            A = eye(1000)
+
+        assert self.buffer.sym == [r'A=I_{1000}']
+        assert self.buffer.num == [
+            r'A=\begin{bmatrix}1&\cdots&0\\\vdots&\ddots&\vdots\\0&\cdots&1\end{bmatrix}_{1000}']
+
+    def test_ones_elided(self):
+        @eqtex(output=self.buffer)
+        def func():
+            A = ones([2, 1000])
+            B = zeros([1000, 1000])
+
+        assert self.buffer.sym == [r'A=\begin{bmatrix}1&\cdots&1\\1&\cdots&1\end{bmatrix}_{2 \times 1000}',
+                                   r'B=\begin{bmatrix}0&\cdots&0\\\vdots&\ddots&\vdots\\0&\cdots&0\end{bmatrix}'
+                                   r'_{1000 \times 1000}']
+
     def test_transpose_func(self):
         @eqtex(output=self.buffer)
         def func(a, b):
@@ -116,3 +135,49 @@ class TestNumpy(TestBase):
                                    r'B=\begin{bmatrix}0&0&0\\0&0&0\end{bmatrix}']
         assert self.buffer.num == [r'A=\begin{bmatrix}0&0&0\\0&0&0\end{bmatrix}',
                                    r'B=\begin{bmatrix}0&0&0\\0&0&0\end{bmatrix}']
+
+    def test_array_literals(self):
+        @eqtex(output=self.buffer)
+        def func(a):
+            A = array([[1, -2.5], [3, 4]])
+            B = array([1, -a, 2])
+
+        assert self.buffer.sym == [r'A=\begin{bmatrix}1& - 2.5\\3&4\end{bmatrix}',
+                                   r'B=\begin{bmatrix}1& - a&2\end{bmatrix}']
+
+    def test_array_elided(self):
+        global eqtex_config
+        eqtex_config.max_array_size = 3
+        eqtex_config.matrix_corner_size = 2
+
+        @eqtex(output=self.buffer)
+        def func(a):
+            A = array([[1, 2, 3, 4, 5], [6, 7, 8, 9, 10], [11, 12, 13, 14, a]])
+            B = array([1, 2, 3])
+            C = array([1, 2, 3, 4])
+
+        assert self.buffer.sym == [r'A=\begin{bmatrix}1&2&\cdots&4&5\\6&7&\cdots&9&10\\11&12&\cdots&14&a\end{bmatrix}'
+                                   r'_{3 \times 5}',
+                                   r'B=\begin{bmatrix}1&2&3\end{bmatrix}',
+                                   r'C=\begin{bmatrix}1&2&3&4\end{bmatrix}']
+
+    def test_array_ragged(self):
+        global eqtex_config
+        eqtex_config.max_array_size = 1
+
+        @eqtex(output=self.buffer)
+        def func():
+            A = array([[1, 2, 3], [4]])
+
+        assert self.buffer.sym == [r'A=\begin{bmatrix}1&2&3\\4\end{bmatrix}']
+
+    def test_ones_corner(self):
+        global eqtex_config
+        eqtex_config.max_matrix_size = 3
+        eqtex_config.matrix_corner_size = 2
+
+        @eqtex(output=self.buffer)
+        def func():
+            A = ones([1, 4])
+
+        assert self.buffer.sym == [r'A=\begin{bmatrix}1&1&1&1\end{bmatrix}']
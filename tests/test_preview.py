@@ -0,0 +1,123 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import tempfile
+
+from common import *
+from eqtex import *
+from eqtex import preview
+from eqtex.image_cache import ImageCache
+from eqtex.preview import PreviewOutput
+
+
+class TestPreviewOutput(TestBase):
+    def setup_method(self):
+        super().setup_method()
+        self.batches = []
+        self.render_batch = preview._render_batch
+        preview._render_batch = self.fake_render_batch
+
+    def teardown_method(self):
+        super().teardown_method()
+        preview._render_batch = self.render_batch
+        os.system('rm *png -f')
+
+    def fake_render_batch(self, batch):
+        self.batches.append([name for name, _ in batch])
+        for name, tex in batch:
+            with open(name, 'w') as f:
+                f.write(tex)
+
+    def test_batch_split(self):
+        output = PreviewOutput(batch_size=2, jobs=3, cache=False)
+        output.render([(f'{i}.png', str(i)) for i in range(5)])
+        assert sorted(len(batch) for batch in self.batches) == [1, 2, 2]
+
+        self.batches.clear()
+        output.render([(f'{i}.png', str(i)) for i in range(3)])
+        assert sorted(len(batch) for batch in self.batches) == [1, 1, 1]
+
+    def test_equation_number(self):
+        output = PreviewOutput(deferred=True, cache=False)
+        config = eqtex_config.snapshot().replace(file_output_single_eq=False)
+        output.process('func', [], Output.EqType.SYM, ['a=1', 'b=2'], config)
+        assert [tex for _, tex in output.queue] == [
+            r'\setcounter{equation}{0}\begin{equation}\begin{aligned}a=1\end{aligned}\end{equation}',
+            r'\setcounter{equation}{0}\begin{equation}\begin{aligned}b=2\end{aligned}\end{equation}']
+        output.queue = []
+
+    def test_batch_functions(self):
+        prefix = 'TestPreviewOutput_test_batch_functions'
+        global eqtex_config
+        eqtex_config.file_output_single_eq = True
+        output = PreviewOutput(batch_size=2, jobs=2, cache=False)
+
+        @eqtex(output=output)
+        def func1(x):
+            a = x
+
+        assert self.batches == []
+        assert not os.path.exists(f'{prefix}_func1_sym.png')
+
+        @eqtex(output=output)
+        def func2(x):
+            b = x
+
+        assert sorted(sum(self.batches, [])) == [f'{prefix}_func1_num.png', f'{prefix}_func1_sym.png',
+                                                 f'{prefix}_func2_num.png', f'{prefix}_func2_sym.png']
+
+        self.batches.clear()
+
+        @eqtex(output=output)
+        def func3(x):
+            c = x
+
+        assert self.batches == []
+        eqtex.flush()
+        assert sorted(sum(self.batches, [])) == [f'{prefix}_func3_num.png', f'{prefix}_func3_sym.png']
+        assert os.path.exists(f'{prefix}_func3_sym.png')
+
+    def test_deferred(self):
+        output = PreviewOutput(batch_size=1, jobs=1, deferred=True, cache=False)
+
+        @eqtex(output=output)
+        def func(x):
+            a = x
+
+        assert self.batches == []
+        eqtex.flush()
+        assert len(self.batches) == 2
+        assert output.queue == []
+
+    def test_cache(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            output = PreviewOutput(batch_size=1, jobs=1, cache=ImageCache(cache_dir))
+            output.queue = [('a.png', 'a'), ('b.png', 'b'), ('c.png', 'a')]
+            output.flush()
+            assert sorted(sum(self.batches, [])) == ['a.png', 'b.png']
+            with open('c.png', 'r') as f:
+                assert f.read() == 'a'
+
+            self.batches.clear()
+            os.remove('a.png')
+            output.queue = [('a.png', 'a'), ('d.png', 'd')]
+            output.flush()
+            assert self.batches == [['d.png']]
+            with open('a.png', 'r') as f:
+                assert f.read() == 'a'
+            assert output.cache.hits == 2
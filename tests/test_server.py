@@ -0,0 +1,115 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import io
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+
+from common import *
+from eqtex.server import Server
+
+SOURCE = ('from eqtex import eqtex\n'
+          '\n'
+          'class A:\n'
+          '    @eqtex()\n'
+          '    def func(self, x):\n'
+          '        a = x + 1\n'
+          '        b = a * 2\n')
+
+
+class TestServer(TestBase):
+    def setup_method(self):
+        super().setup_method()
+        self.server = Server(jobs=4)
+
+    def teardown_method(self):
+        super().teardown_method()
+        self.server.executor.shutdown()
+        for path in ['server_src.py', 'server.sock']:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def call(self, method, request_id=1, **params):
+        return self.server.handle(json.dumps({'jsonrpc': '2.0', 'id': request_id, 'method': method, 'params': params}))
+
+    def test_translate_source(self):
+        response = self.call('translate', source=SOURCE, qualname='A.func')
+        assert response == {'jsonrpc': '2.0', 'id': 1,
+                            'result': {'sym': ['a=x + 1', 'b=a \\cdot 2'], 'num': ['a=x + 1', 'b=x + 1 \\cdot 2']}}
+
+        assert self.call('translate', source=SOURCE, qualname='A.func') == response
+        assert self.server._sources.hits == 1
+        assert self.server._results.hits == 1
+
+        response = self.call('translate', source=SOURCE, qualname='A.func', options={'val_equation': False})
+        assert response['result'] == {'sym': ['a=x + 1', 'b=a \\cdot 2'], 'num': []}
+
+    def test_translate_path(self):
+        with open('server_src.py', 'w') as f:
+            f.write(SOURCE)
+
+        assert self.call('functions', path='server_src.py')['result'] == ['A.func']
+        assert self.call('translate', path='server_src.py', qualname='A.func')['result']['sym'][0] == 'a=x + 1'
+
+    def test_errors(self):
+        assert self.server.handle('{')['error']['code'] == -32700
+        assert self.server.handle('[]')['error']['code'] == -32600
+        assert self.call('unknown')['error']['code'] == -32601
+        assert self.call('translate', source=SOURCE, qualname='B.func')['error']['code'] == -32602
+        assert self.call('translate', source='def f(:', qualname='f')['error']['code'] == -32602
+        assert self.call('translate', source=SOURCE, qualname='A.func', options={'bad': 1})['error']['code'] == -32602
+        assert self.server.handle(json.dumps({'jsonrpc': '2.0', 'method': 'stats'})) is None
+
+    def test_serve(self):
+        requests = [json.dumps({'jsonrpc': '2.0', 'id': i, 'method': 'translate',
+                                'params': {'source': SOURCE.replace('1', str(i)), 'qualname': 'A.func'}})
+                    for i in range(20)]
+        writer = io.StringIO()
+        self.server.serve(io.StringIO('\n'.join(requests) + '\n'), writer)
+
+        responses = {r['id']: r['result'] for r in map(json.loads, writer.getvalue().splitlines())}
+        assert sorted(responses) == list(range(20))
+        assert all(responses[i]['sym'][0] == f'a=x + {i}' for i in range(20))
+
+    def test_unix_socket(self):
+        unix_server = self.server.unix_server('server.sock')
+        thread = threading.Thread(target=unix_server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            with socket.socket(socket.AF_UNIX) as client:
+                for _ in range(500):
+                    try:
+                        client.connect('server.sock')
+                        break
+                    except OSError:
+                        time.sleep(0.01)
+                else:
+                    pytest.fail('Could not connect to server.sock')
+                client.sendall(json.dumps({'jsonrpc': '2.0', 'id': 7, 'method': 'functions',
+                                           'params': {'source': SOURCE}}).encode() + b'\n')
+                with client.makefile('r') as reader:
+                    assert json.loads(reader.readline()) == {'jsonrpc': '2.0', 'id': 7, 'result': ['A.func']}
+        finally:
+            unix_server.shutdown()
+            unix_server.server_close()
+            thread.join()
+            os.remove('server.sock')
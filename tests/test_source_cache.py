@@ -0,0 +1,88 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import os
+
+from common import *
+from eqtex import *
+
+
+class TestSourceCache(TestBase):
+    def setup_method(self):
+        super().setup_method()
+        eqtex_source_cache.clear()
+
+    def teardown_method(self):
+        super().teardown_method()
+        os.system('rm cached_module.py -f')
+
+    def test_single_parse(self):
+        @eqtex(output=self.buffer)
+        def func1():
+            a = 1
+
+        @eqtex(output=self.buffer)
+        def func2():
+            b = 2
+
+        assert eqtex_source_cache.misses == 1
+        assert eqtex_source_cache.hits == 1
+        assert self.buffer.sym == ['b=2']
+
+    def test_modified_file(self):
+        with open('cached_module.py', 'w') as f:
+            f.write('a = 1\n')
+        first = eqtex_source_cache.get('cached_module.py')
+        assert eqtex_source_cache.get('cached_module.py') is first
+
+        with open('cached_module.py', 'w') as f:
+            f.write('a = 1\nb = 2\n')
+        second = eqtex_source_cache.get('cached_module.py')
+        assert second is not first
+        assert len(second.body) == 2
+        assert eqtex_source_cache.misses == 2
+        assert eqtex_source_cache.hits == 1
+
+    def test_eviction(self):
+        eqtex_source_cache.max_size = 1
+        try:
+            with open('cached_module.py', 'w') as f:
+                f.write('a = 1\n')
+            eqtex_source_cache.get('cached_module.py')
+            eqtex_source_cache.get(__file__)
+            eqtex_source_cache.get('cached_module.py')
+            assert eqtex_source_cache.misses == 3
+        finally:
+            eqtex_source_cache.max_size = 64
+
+    def test_function_index(self):
+        with open('cached_module.py', 'w') as f:
+            f.write('@eqtex()\n'
+                    'def f():\n'
+                    '    a = 1\n'
+                    'class A:\n'
+                    '    @eqtex()\n'
+                    '    def g(self):\n'
+                    '        b = 2\n'
+                    '    def h(self):\n'
+                    '        @eqtex()\n'
+                    '        def i():\n'
+                    '            c = 3\n')
+        functions = eqtex_source_cache.functions('cached_module.py')
+        assert sorted(functions) == ['A.g', 'A.h.i', 'f']
+        assert functions['A.h.i'][0][0] == ('A', 'h')
+        assert eqtex_source_cache.functions('cached_module.py') is functions
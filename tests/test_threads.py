@@ -0,0 +1,143 @@
+# This file is part of EqTex.
+#
+# Copyright 2019 Tomasz Jankowski
+#
+# EqTex is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Lesser Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# EqTex is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Lesser Public License for more details.
+#
+# You should have received a copy of the GNU Lesser Public License
+# along with EqTex. If not, see <http://www.gnu.org/licenses/>.
+
+import concurrent.futures
+import importlib
+import os
+import shutil
+import sys
+import threading
+
+from common import *
+from eqtex import *
+from eqtex.build_cache import get_build_cache
+
+PACKAGE = ('from eqtex import Output\n'
+           '\n'
+           'class Recorder(Output):\n'
+           '    def __init__(self):\n'
+           '        self.tex = {}\n'
+           '\n'
+           '    def process(self, func_name, cls_prefix, eq_type, tex, config):\n'
+           '        self.tex[(func_name, eq_type.value)] = tex\n'
+           '\n'
+           'OUTPUT = Recorder()\n')
+
+MODULE = ('from eqtex import eqtex\n'
+          'from stress_pkg import OUTPUT\n'
+          '\n'
+          '{0}')
+
+FUNCTION = ('@eqtex(output=OUTPUT)\n'
+            'def func_{0}_{1}(x):\n'
+            '    a = x + {0}\n'
+            '    b = a * {1}\n'
+            '\n')
+
+MODULES = 24
+FUNCTIONS = 20
+
+
+class TestThreads(TestBase):
+    def setup_method(self):
+        super().setup_method()
+        shutil.rmtree('stress_pkg', ignore_errors=True)
+        os.makedirs('stress_pkg')
+        with open('stress_pkg/__init__.py', 'w') as f:
+            f.write(PACKAGE)
+        for i in range(MODULES):
+            with open(f'stress_pkg/module_{i}.py', 'w') as f:
+                f.write(MODULE.format(''.join(FUNCTION.format(i, j) for j in range(FUNCTIONS))))
+        sys.path.insert(0, os.getcwd())
+        eqtex_source_cache.clear()
+
+    def teardown_method(self):
+        super().teardown_method()
+        sys.path.remove(os.getcwd())
+        for name in [name for name in sys.modules if name.startswith('stress_pkg')]:
+            del sys.modules[name]
+        shutil.rmtree('stress_pkg', ignore_errors=True)
+        eqtex_source_cache.clear()
+
+    def test_concurrent_imports(self):
+        eqtex_config.build_cache = 'test_threads_cache.json'
+        eqtex_config.stats = True
+        try:
+            with concurrent.futures.ThreadPoolExecutor(8) as executor:
+                list(executor.map(importlib.import_module, [f'stress_pkg.module_{i}' for i in range(MODULES)]))
+        finally:
+            cache = get_build_cache('test_threads_cache.json', 'Recorder')
+            cache.files.clear()
+            cache.modified = False
+            if os.path.exists('test_threads_cache.json'):
+                os.remove('test_threads_cache.json')
+
+        tex = sys.modules['stress_pkg'].OUTPUT.tex
+        assert len(tex) == 2 * MODULES * FUNCTIONS
+        for i in range(MODULES):
+            for j in range(FUNCTIONS):
+                assert tex[(f'func_{i}_{j}', 'sym')] == [f'a=x + {i}', rf'b=a \cdot {j}']
+                assert tex[(f'func_{i}_{j}', 'num')] == [f'a=x + {i}', rf'b=x + {i} \cdot {j}']
+
+        assert eqtex_source_cache.misses == MODULES
+        eqtex_stats.reset()
+
+    def test_one_parse_per_file(self):
+        path = 'stress_pkg/module_0.py'
+        barrier = threading.Barrier(16)
+
+        def functions(_):
+            barrier.wait()
+            return eqtex_source_cache.functions(path)
+
+        with concurrent.futures.ThreadPoolExecutor(16) as executor:
+            results = list(executor.map(functions, range(16)))
+
+        assert eqtex_source_cache.misses == 1
+        assert all(r is results[0] for r in results)
+        assert len(results[0]) == FUNCTIONS
+
+    def test_lazy_flush(self):
+        eqtex_config.lazy = True
+        module = importlib.import_module('stress_pkg.module_0')
+
+        with concurrent.futures.ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda _: flush(), range(8)))
+
+        assert len(sys.modules['stress_pkg'].OUTPUT.tex) == 2 * FUNCTIONS
+        assert get_tex(module.func_0_1) == (['a=x + 0', r'b=a \cdot 1'], ['a=x + 0', r'b=x + 0 \cdot 1'])
+
+    def test_slots_output(self):
+        class SlotsRecorder(Output):
+            __slots__ = ('tex',)
+
+            def __init__(self):
+                self.tex = []
+
+            def process(self, func_name, cls_prefix, eq_type, tex, config):
+                self.tex.append(tex)
+
+        output = SlotsRecorder()
+
+        @eqtex(output=output)
+        def func(x):
+            a = x
+
+        assert not hasattr(output, '__dict__')
+        assert output.tex == [['a=x'], ['a=x']]
+        assert output.lock() is output.lock()
+